@@ -7,9 +7,24 @@ warriors to act in battle against each other.
 
 The team that defeats the other wins.
 
+Battles can also be played headlessly between two computer-controlled teams
+with simulate(), which is used to measure the win rates of warrior teams.
+
+Every headless battle owns a seedable RNG, so a battle can be reproduced from
+its seed, and battles can be recorded to a replay log (see GOZI2Replay).
+
+Headless battles can also report their turns to a telemetry object (see
+GOZI2Telemetry), which is given events for every turn, damage dealt, special,
+and defeat.
+
 """
 
-from random import randint, shuffle
+import os
+import json
+import random
+from random import shuffle
+from collections import namedtuple
+from contextlib import contextmanager
 
 global warrior_names
 
@@ -18,12 +33,14 @@ warrior_names = ["Norman", "Eric", "Lenna", "FiveStar", "Assa", "Kasime",
                  "Pyro", "Gura", "Nimbus", "Maria", "Raijin", "Axim",
                  "Rex", "Ninji"]
 
+#battle messages are passed to output(), which is print() unless the battle is
+#headless (see headless())
+output = print
+
 class Summoner:
     """Class for the player and computer's attributes."""
 
-    score = 0
-
-    def __init__(self, tag):
+    def __init__(self, tag, ai = None, rng = random, log = None):
         """Give the summoner a tag for player or computer.
 
         All of the summoner's warriors will share the tag.
@@ -31,9 +48,26 @@ class Summoner:
         The tag is used to identify whether the player will control the warrior
         or the computer will automatically control the warrior.
 
+        The computer's warriors can be given an AI (see GOZI2AI) to choose
+        their moves instead of target_set() and special_save().
+
+        The warriors draw their random numbers from the RNG (the random module
+        or a random.Random object), and the computer's moves are recorded in
+        the log if there is one.
+
         """
 
         self.tag = tag
+        self.ai = ai
+        self.rng = rng
+        self.log = log
+
+        #the warriors in the current round's turn order (set by battle(), so
+        #an AI can see which warriors are still to act)
+        self.order = []
+
+        #each summoner keeps its own score
+        self.score = 0
 
     def team_build(self, team):
         """Create the summoner's team.
@@ -44,14 +78,20 @@ class Summoner:
 
         """
 
-        #eval is used to get the Warrior subclass fromt the string
-        self.w0 = eval(team[0])(self.tag)
-        self.w1 = eval(team[1])(self.tag)
-        self.w2 = eval(team[2])(self.tag)
+        #the Warrior subclass is looked up from the string in the registry
+        self.w0 = warrior_classes[team[0]](self.tag)
+        self.w1 = warrior_classes[team[1]](self.tag)
+        self.w2 = warrior_classes[team[2]](self.tag)
 
         #the team is set as the warrior objects rather than the strings
         self.team = [self.w0, self.w1, self.w2]
 
+        #all warriors on the team share the summoner's AI, RNG and log
+        for warrior in self.team:
+            warrior.ai = self.ai
+            warrior.rng = self.rng
+            warrior.log = self.log
+
 class Warrior:
     """Base class for all common warrior attributes."""
 
@@ -59,6 +99,13 @@ class Warrior:
     alive = True
     charge = 0
 
+    #warriors without an AI use target_set() and special_save()
+    ai = None
+
+    #warriors use the random module's RNG and aren't recorded by default
+    rng = random
+    log = None
+
     def __init__(self, tag):
         """Tag the warrior with the summoner's tag.
 
@@ -82,7 +129,7 @@ class Warrior:
         if self.alive == False: return
         
         #indicates the warrior having a turn
-        print("It is ", self.name, "'s turn!", sep = "")
+        output("It is ", self.name, "'s turn!", sep = "")
         
         if self.tag == "p":
             #loop used to get correct input and to ensure an attack or special
@@ -106,17 +153,25 @@ class Warrior:
                 else: print("Sorry, I didn't understand that.")
 
         else:
-            #chooses the warrior with the lowest health to be the target
-            opponents = sorted(player.team, key = lambda w: w.power, reverse = True)
-            opponents.sort(key = lambda w: w.health)
-            
-            target = self.target_set(opponents)
-
-            if self.charge >= self.cost:
-                if self.special_save(target):
-                    self.attack(player, computer, target)
-                else:
-                    self.special(player, computer, target)
+            if self.ai:
+                #the AI chooses whether to use the special and the target
+                special, target = self.ai.choose(self, player, computer)
+
+            else:
+                #chooses the warrior with the lowest health to be the target
+                opponents = sorted(player.team, key = lambda w: w.power,
+                                   reverse = True)
+                opponents.sort(key = lambda w: w.health)
+
+                target = self.target_set(opponents)
+
+                #the special is used when charged, unless it should be saved
+                special = (self.charge >= self.cost
+                           and not self.special_save(target))
+
+            if self.log: self.log.move(self, special, target)
+
+            if special: self.special(player, computer, target)
             else: self.attack(player, computer, target)
 
     def attack(self, player, computer, target = None):
@@ -128,40 +183,89 @@ class Warrior:
         """
 
         if self.tag == "p":
-            #loop for useable input
-            while True:
-                print("Attack", computer.w0.name, "(1),", computer.w1.name,
-                      "(2),", computer.w2.name, "(3), or cancel (c)? ",
-                      end = "")
-                choice = input()
-
-                #target is set here for code shortening
-                if choice == "1" and computer.w0.alive == True:
-                    target = computer.w0
-                elif choice == "2" and computer.w1.alive == True:
-                    target = computer.w1
-                elif choice == "3" and computer.w2.alive == True:
-                    target = computer.w2
-
-                elif choice == "c": return
-
-                else: print("Please choose a living warrior to attack.")
-
-                if target: break
+            target = self.target_choice(computer)
+            if not target: return
 
         #the damage dealt is determined randomly after target determination
-        damage = int(self.power * randint(80, 120) / 100)
+        damage = int(self.power * self.rng.randint(80, 120) / 100)
 
         #an attack will deal damage and charge the giver and taker
         target.health -= damage
         target.charge += 1
         self.charge += 1
 
-        print(self.name, "used", self.attack_name, "on", target.name,
-              "and dealt", damage, "damage!")
+        output(self.name, "used", self.attack_name, "on", target.name,
+               "and dealt", damage, "damage!")
+
+        return True
+
+    def special(self, player, computer, target = None):
+        """Perform the warrior's special.
+
+        The special is described by the warrior's row in special_moves and
+        performed by perform_special(), which is the same for every warrior.
+
+        The computer will use the special on a predetermined target.
+        The player will choose their target (or confirm a special that has no
+        single target) within the function via input().
+
+        """
+
+        if self.special_check():
+            return
+
+        move = special_moves[self.name]
+
+        if self.tag == "p":
+            print(self.special_name,
+                  "\n" + self.special_desc)
+
+            if move.splash:
+                #loop for useable input
+                while True:
+                    choice = input("Perform your special? (y/n) ")
+
+                    if choice == "y": break
+                    elif choice == "n": return
+                    else: print("Please choose a living warrior to attack.")
+
+            else:
+                target = self.target_choice(computer)
+                if not target: return
+
+        #the player's opponents are the computer's team (and vice versa)
+        if self.tag == "p": opponents, allies = computer.team, player.team
+        else: opponents, allies = player.team, computer.team
+
+        perform_special(self, move, target, opponents, allies)
 
         return True
 
+    def target_choice(self, computer):
+        """Let the player choose a living opponent to target.
+
+        None is returned if the player cancels.
+
+        """
+
+        #loop for useable input
+        while True:
+            print("Attack", computer.w0.name, "(1),", computer.w1.name,
+                  "(2),", computer.w2.name, "(3), or cancel (c)? ",
+                  end = "")
+            choice = input()
+
+            if choice == "1" and computer.w0.alive == True:
+                return computer.w0
+            elif choice == "2" and computer.w1.alive == True:
+                return computer.w1
+            elif choice == "3" and computer.w2.alive == True:
+                return computer.w2
+
+            elif choice == "c": return
+
+            else: print("Please choose a living warrior to attack.")
+
     def special_check(self):
         """Check if the warrior has enough charge to perform a special."""
 
@@ -242,48 +346,6 @@ class Norman(Warrior):
     
     special_type = "attack"
 
-    def special(self, player, computer, target = None):
-        """Perform the warrior's special."""
-
-        if self.special_check():
-            return
-
-        if self.tag == "p":
-            print(self.special_name,
-                  "\n" + self.special_desc)
-
-            #loop for useable input
-            while True:
-                print("Attack", computer.w0.name, "(1),", computer.w1.name,
-                      "(2),", computer.w2.name, "(3), or cancel (c)? ",
-                      end = "")
-                choice = input()
-
-                if choice == "1" and computer.w0.alive == True:
-                    target = computer.w0
-                elif choice == "2" and computer.w1.alive == True:
-                    target = computer.w1
-                elif choice == "3" and computer.w2.alive == True:
-                    target = computer.w2
-
-                elif choice == "c": return
-
-                else: print("Please choose a living warrior to attack.")
-
-                if target: break
-
-        damage = int(3 * self.power * randint(80, 120) / 100)
-
-        #the special will drain the user's charge instead of charging it
-        target.health -= damage
-        target.charge += 1
-        self.charge -= self.cost
-
-        print(self.name, "used", self.special_name, "on", target.name,
-              "and dealt", damage, "damage!")
-
-        return True
-
 class Eric(Warrior):
     """Warrior subclass for Eric's specific attributes."""
 
@@ -302,51 +364,6 @@ class Eric(Warrior):
     
     special_type = "attack"
 
-    def special(self, player, computer, target = None):
-        """Perform the warrior's special."""
-
-        if self.special_check():
-            return
-
-        if self.tag == "p":
-            print(self.special_name,
-                  "\n" + self.special_desc)
-
-            #loop for useable input
-            while True:
-                print("Attack", computer.w0.name, "(1),", computer.w1.name,
-                      "(2),", computer.w2.name, "(3), or cancel (c)? ",
-                      end = "")
-                choice = input()
-
-                if choice == "1" and computer.w0.alive == True:
-                    target = computer.w0
-                elif choice == "2" and computer.w1.alive == True:
-                    target = computer.w1
-                elif choice == "3" and computer.w2.alive == True:
-                    target = computer.w2
-
-                elif choice == "c": return
-
-                else: print("Please choose a living warrior to attack.")
-
-                if target: break
-
-        damage = int(2 * self.power * randint(80, 120) / 100)
-        if target.health - damage < 0: heal = int(target.health / 2)
-        else: heal = int(damage / 2)
-
-        #the special will drain the user's charge instead of charging it
-        target.health -= damage
-        target.charge += 1
-        self.charge -= self.cost
-
-        print(self.name, "used", self.special_name, "on", target.name,
-              "and dealt", damage, "damage!")
-        print(self.name, "healed", heal, "health!")
-
-        return True
-
 class Lenna(Warrior):
     """Warrior subclass for Lenna's specific attributes."""
 
@@ -365,48 +382,6 @@ class Lenna(Warrior):
     
     special_type = "attack"
 
-    def special(self, player, computer, target = None):
-        """Perform the warrior's special."""
-
-        if self.special_check():
-            return
-
-        if self.tag == "p":
-            print(self.special_name,
-                  "\n" + self.special_desc)
-
-            #loop for useable input
-            while True:
-                print("Attack", computer.w0.name, "(1),", computer.w1.name,
-                      "(2),", computer.w2.name, "(3), or cancel (c)? ",
-                      end = "")
-                choice = input()
-
-                if choice == "1" and computer.w0.alive == True:
-                    target = computer.w0
-                elif choice == "2" and computer.w1.alive == True:
-                    target = computer.w1
-                elif choice == "3" and computer.w2.alive == True:
-                    target = computer.w2
-
-                elif choice == "c": return
-
-                else: print("Please choose a living warrior to attack.")
-
-                if target: break
-
-        damage = int(5 * self.power * randint(80, 120) / 100)
-
-        #the special will drain the user's charge instead of charging it
-        target.health -= damage
-        target.charge += 1
-        self.charge -= self.cost
-
-        print(self.name, "used", self.special_name, "on", target.name,
-              "and dealt", damage, "damage!")
-
-        return True
-
 class FiveStar(Warrior):
     """Warrior subclass for FiveStar's specific attributes."""
 
@@ -425,47 +400,6 @@ class FiveStar(Warrior):
     
     special_type = "splash"
 
-    def special(self, player, computer, target = None):
-        """Perform the warrior's special."""
-
-        if self.special_check():
-            return
-
-        if self.tag == "p":
-            print(self.special_name,
-                  "\n" + self.special_desc)
-
-            #loop for useable input
-            while True:
-                choice = input("Perform your special? (y/n) ")
-
-                if choice == "y": break
-                elif choice == "n": return
-                else: print("Please choose a living warrior to attack.")
-
-        damage0 = int(1.5 * self.power * randint(80, 120) / 100)
-        damage1 = int(1.5 * self.power * randint(80, 120) / 100)
-        damage2 = int(1.5 * self.power * randint(80, 120) / 100)
-
-        self.charge -= self.cost
-
-        if self.tag == "p": summoner = computer
-        else: summoner = player
-
-        damage_no = 0
-
-        #all warriors on the opposing team are attacked
-        for warrior in summoner.team:
-            if warrior.alive == True:
-                damage = eval("damage" + str(damage_no))
-                warrior.health -= damage
-                warrior.charge += 1
-                print(self.name, "used", self.special_name, "on", warrior.name,
-                      "and dealt", damage, "damage!")
-            damage_no += 1
-
-        return True
-        
 class Assa(Warrior):
     """Warrior subclass for Assa's specific attributes."""
 
@@ -485,48 +419,6 @@ class Assa(Warrior):
     
     special_type = "attack"
 
-    def special(self, player, computer, target = None):
-        """Perform the warrior's special."""
-
-        if self.special_check():
-            return
-
-        if self.tag == "p":
-            print(self.special_name,
-                  "\n" + self.special_desc)
-
-            #loop for useable input
-            while True:
-                print("Attack", computer.w0.name, "(1),", computer.w1.name,
-                      "(2),", computer.w2.name, "(3), or cancel (c)? ",
-                      end = "")
-                choice = input()
-
-                if choice == "1" and computer.w0.alive == True:
-                    target = computer.w0
-                elif choice == "2" and computer.w1.alive == True:
-                    target = computer.w1
-                elif choice == "3" and computer.w2.alive == True:
-                    target = computer.w2
-
-                elif choice == "c": return
-
-                else: print("Please choose a living warrior to attack.")
-
-                if target: break
-
-        damage = int((self.power + target.health * 0.2) * randint(80, 120) / 100)
-
-        #the special will drain the user's charge instead of charging it
-        target.health -= damage
-        target.charge += 1
-        self.charge -= self.cost
-
-        print(self.name, "used", self.special_name, "on", target.name,
-              "and dealt", damage, "damage!")
-
-        return True
-
 class Pyro(Warrior):
     """Warrior subclass for Pyro's specific attributes."""
 
@@ -545,45 +437,6 @@ class Pyro(Warrior):
     
     special_type = "splash"
 
-    def special(self, player, computer, target = None):
-        """Perform the warrior's special."""
-
-        if self.special_check():
-            return
-
-        if self.tag == "p":
-            print(self.special_name,
-                  "\n" + self.special_desc)
-
-            while True:
-                choice = input("Perform your special? (y/n) ")
-
-                if choice == "y": break
-                elif choice == "n": return
-                else: print("Please choose a living warrior to attack.")
-
-        damage0 = int(1.5 * self.power * randint(80, 120) / 100)
-        damage1 = int(1.5 * self.power * randint(80, 120) / 100)
-        damage2 = int(1.5 * self.power * randint(80, 120) / 100)
-
-        self.charge -= self.cost
-
-        if self.tag == "p": summoner = computer
-        else: summoner = player
-
-        damage_no = 0
-
-        for warrior in summoner.team:
-            if warrior.alive == True:
-                damage = eval("damage" + str(damage_no))
-                warrior.health -= damage
-                warrior.charge += 1
-                print(self.name, "used", self.special_name, "on", warrior.name,
-                      "and dealt", damage, "damage!")
-            damage_no += 1
-
-        return True
-
 class Gura(Warrior):
     """Warrior subclass for Gura's specific attributes."""
 
@@ -602,48 +455,6 @@ class Gura(Warrior):
     
     special_type = "attack"
 
-    def special(self, player, computer, target = None):
-        """Perform the warrior's special."""
-
-        if self.special_check():
-            return
-
-        if self.tag == "p":
-            print(self.special_name,
-                  "\n" + self.special_desc)
-
-            #loop for useable input
-            while True:
-                print("Attack", computer.w0.name, "(1),", computer.w1.name,
-                      "(2),", computer.w2.name, "(3), or cancel (c)? ",
-                      end = "")
-                choice = input()
-
-                if choice == "1" and computer.w0.alive == True:
-                    target = computer.w0
-                elif choice == "2" and computer.w1.alive == True:
-                    target = computer.w1
-                elif choice == "3" and computer.w2.alive == True:
-                    target = computer.w2
-
-                elif choice == "c": return
-
-                else: print("Please choose a living warrior to attack.")
-
-                if target: break
-
-        damage = int(2 * self.power * randint(80, 120) / 100)
-
-        #the special will drain the user's charge instead of charging it
-        target.health -= damage
-        target.charge += 1
-        self.charge -= self.cost
-
-        print(self.name, "used", self.special_name, "on", target.name,
-              "and dealt", damage, "damage!")
-
-        return True
-
 class Nimbus(Warrior):
     """Warrior subclass for Nimbus' specific attributes."""
 
@@ -662,45 +473,6 @@ class Nimbus(Warrior):
     
     special_type = "splash"
 
-    def special(self, player, computer, target = None):
-        """Perform the warrior's special."""
-
-        if self.special_check():
-            return
-
-        if self.tag == "p":
-            print(self.special_name,
-                  "\n" + self.special_desc)
-
-            while True:
-                choice = input("Perform your special? (y/n) ")
-
-                if choice == "y": break
-                elif choice == "n": return
-                else: print("Please choose a living warrior to attack.")
-
-        damage0 = int(self.power * randint(80, 120) / 100)
-        damage1 = int(self.power * randint(80, 120) / 100)
-        damage2 = int(self.power * randint(80, 120) / 100)
-
-        self.charge -= self.cost
-
-        if self.tag == "p": summoner = computer
-        else: summoner = player
-
-        damage_no = 0
-
-        for warrior in summoner.team:
-            if warrior.alive == True:
-                damage = eval("damage" + str(damage_no))
-                warrior.health -= damage
-                warrior.charge += 1
-                print(self.name, "used", self.special_name, "on", warrior.name,
-                      "and dealt", damage, "damage!")
-            damage_no += 1
-
-        return True
-
 class Maria(Warrior):
     """Warrior subclass for Maria's specific attributes."""
 
@@ -720,48 +492,6 @@ class Maria(Warrior):
     
     special_type = "attack"
 
-    def special(self, player, computer, target = None):
-        """Perform the warrior's special."""
-
-        if self.special_check():
-            return
-
-        if self.tag == "p":
-            print(self.special_name,
-                  "\n" + self.special_desc)
-
-            #loop for useable input
-            while True:
-                print("Attack", computer.w0.name, "(1),", computer.w1.name,
-                      "(2),", computer.w2.name, "(3), or cancel (c)? ",
-                      end = "")
-                choice = input()
-
-                if choice == "1" and computer.w0.alive == True:
-                    target = computer.w0
-                elif choice == "2" and computer.w1.alive == True:
-                    target = computer.w1
-                elif choice == "3" and computer.w2.alive == True:
-                    target = computer.w2
-
-                elif choice == "c": return
-
-                else: print("Please choose a living warrior to attack.")
-
-                if target: break
-
-        damage = int(2.5 * self.power * randint(80, 120) / 100)
-
-        #the special will drain the user's charge instead of charging it
-        target.health -= damage
-        target.charge += 1
-        self.charge -= self.cost
-
-        print(self.name, "used", self.special_name, "on", target.name,
-              "and dealt", damage, "damage!")
-
-        return True
-
 class Raijin(Warrior):
     """Warrior subclass for Raijin's specific attributes."""
 
@@ -781,48 +511,6 @@ class Raijin(Warrior):
     
     special_type = "attack"
 
-    def special(self, player, computer, target = None):
-        """Perform the warrior's special."""
-
-        if self.special_check():
-            return
-
-        if self.tag == "p":
-            print(self.special_name,
-                  "\n" + self.special_desc)
-
-            #loop for useable input
-            while True:
-                print("Attack", computer.w0.name, "(1),", computer.w1.name,
-                      "(2),", computer.w2.name, "(3), or cancel (c)? ",
-                      end = "")
-                choice = input()
-
-                if choice == "1" and computer.w0.alive == True:
-                    target = computer.w0
-                elif choice == "2" and computer.w1.alive == True:
-                    target = computer.w1
-                elif choice == "3" and computer.w2.alive == True:
-                    target = computer.w2
-
-                elif choice == "c": return
-
-                else: print("Please choose a living warrior to attack.")
-
-                if target: break
-
-        damage = int(2.5 * self.power * randint(80, 120) / 100)
-
-        #the special will drain the user's charge instead of charging it
-        target.health -= damage0
-        target.charge += 1
-        self.charge -= self.cost
-
-        print(self.name, "used", self.special_name, "on", target.name,
-              "and dealt", damage, "damage!")
-
-        return True
-        
 class Axim(Warrior):
     """Warrior subclass for Axim's specific attributes."""
 
@@ -842,48 +530,6 @@ class Axim(Warrior):
     
     special_type = "attack"
 
-    def special(self, player, computer, target = None):
-        """Perform the warrior's special."""
-
-        if self.special_check():
-            return
-
-        if self.tag == "p":
-            print(self.special_name,
-                  "\n" + self.special_desc)
-
-            #loop for useable input
-            while True:
-                print("Attack", computer.w0.name, "(1),", computer.w1.name,
-                      "(2),", computer.w2.name, "(3), or cancel (c)? ",
-                      end = "")
-                choice = input()
-
-                if choice == "1" and computer.w0.alive == True:
-                    target = computer.w0
-                elif choice == "2" and computer.w1.alive == True:
-                    target = computer.w1
-                elif choice == "3" and computer.w2.alive == True:
-                    target = computer.w2
-
-                elif choice == "c": return
-
-                else: print("Please choose a living warrior to attack.")
-
-                if target: break
-
-        damage = int((self.power + target.health * 0.3) * randint(80, 120) / 100)
-
-        #the special will drain the user's charge instead of charging it
-        target.health -= damage
-        target.charge += 1
-        self.charge -= self.cost
-
-        print(self.name, "used", self.special_name, "on", target.name,
-              "and dealt", damage, "damage!")
-
-        return True
-
 class Rex(Warrior):
     """Warrior subclass for Rex's specific attributes."""
 
@@ -904,65 +550,6 @@ class Rex(Warrior):
     
     special_type = "attack/utility"
 
-    def special(self, player, computer, target = None):
-        """Perform the warrior's special."""
-
-        if self.special_check():
-            return
-
-        if self.tag == "p":
-            print(self.special_name,
-                  "\n" + self.special_desc)
-
-            #loop for useable input
-            while True:
-                print("Attack", computer.w0.name, "(1),", computer.w1.name,
-                      "(2),", computer.w2.name, "(3), or cancel (c)? ",
-                      end = "")
-                choice = input()
-
-                if choice == "1" and computer.w0.alive == True:
-                    target = computer.w0
-                elif choice == "2" and computer.w1.alive == True:
-                    target = computer.w1
-                elif choice == "3" and computer.w2.alive == True:
-                    target = computer.w2
-
-                elif choice == "c": return
-
-                else: print("Please choose a living warrior to attack.")
-
-                if target: break
-
-        damage = int(self.power * randint(80, 120) / 100)
-        shield1 = int(0.5 * self.power * randint(80, 120) / 100)
-        shield2 = int(0.5 * self.power * randint(80, 120) / 100)
-        shield3 = int(0.5 * self.power * randint(80, 120) / 100)
-
-        #the special will drain the user's charge instead of charging it
-        target.health -= damage
-        target.charge += 1
-        self.charge -= self.cost
-
-        print(self.name, "used", self.special_name, "on", target.name,
-              "and dealt", damage, "damage!")
-
-        if self.tag == "p": summoner = player
-        else: summoner = computer
-
-        shield_no = 0
-
-        for warrior in summoner.team:
-            if warrior.alive == True:
-                shield = eval("shield" + str(shield_no))
-                warrior.health += shield
-                warrior.charge += 1
-                print(self.name, "used", self.special_name, "on", warrior.name,
-                      "and shielded", shield, "health!")
-            shield_no += 1
-
-        return True
-
 class Ninji(Warrior):
     """Warrior subclass for Ninji's specific attributes."""
 
@@ -980,48 +567,6 @@ class Ninji(Warrior):
     
     special_type = "attack"
 
-    def special(self, player, computer, target = None):
-        """Perform the warrior's special."""
-
-        if self.special_check():
-            return
-
-        if self.tag == "p":
-            print(self.special_name,
-                  "\n" + self.special_desc)
-
-            #loop for useable input
-            while True:
-                print("Attack", computer.w0.name, "(1),", computer.w1.name,
-                      "(2),", computer.w2.name, "(3), or cancel (c)? ",
-                      end = "")
-                choice = input()
-
-                if choice == "1" and computer.w0.alive == True:
-                    target = computer.w0
-                elif choice == "2" and computer.w1.alive == True:
-                    target = computer.w1
-                elif choice == "3" and computer.w2.alive == True:
-                    target = computer.w2
-
-                elif choice == "c": return
-
-                else: print("Please choose a living warrior to attack.")
-
-                if target: break
-
-        damage = int(2.5 * self.power * randint(80, 120) / 100)
-
-        #the special will drain the user's charge instead of charging it
-        target.health -= damage
-        target.charge += 1
-        self.charge -= self.cost
-
-        print(self.name, "used", self.special_name, "on", target.name,
-              "and dealt", damage, "damage!")
-
-        return True
-
 class Kasime(Warrior):
     """Warrior subclass for Kasime's specific attributes."""
 
@@ -1040,37 +585,118 @@ class Kasime(Warrior):
     
     special_type = "splash"
 
-    def special(self, player, computer, target = None):
-        """Perform the warrior's special."""
-
-        if self.special_check():
-            return
+#all warrior classes by name (used instead of eval() to build teams)
+warrior_classes = {warrior.name: warrior
+                   for warrior in Warrior.__subclasses__()}
+
+#the stat blocks (health, power, speed, cost) of all warriors by name
+stat_blocks = {name: (warrior.health, warrior.power,
+                      warrior.speed, warrior.cost)
+               for name, warrior in warrior_classes.items()}
+
+#a special move: the multiple of the user's power that it attacks with, if it
+#hits every living opponent (splash) instead of one target, the fraction of
+#the target's health added to the power (drain), if the opponents are hit with
+#their own power (mirror), the fraction of the damage dealt that the user
+#heals (heal), and the multiple of the user's power that every living ally is
+#shielded with (shield)
+#the charge that a special costs is the warrior's cost (in its stat block)
+Special = namedtuple("Special",
+                     ["multiplier", "splash", "drain", "mirror", "heal",
+                      "shield"],
+                     defaults = [1, False, 0, False, 0, 0])
+
+#the special move of every warrior (a new special only needs a new row)
+special_moves = {
+    "Norman": Special(multiplier = 3),
+    "Eric": Special(multiplier = 2, heal = 0.5),
+    "Lenna": Special(multiplier = 5),
+    "FiveStar": Special(multiplier = 1.5, splash = True),
+    "Assa": Special(drain = 0.2),
+    "Kasime": Special(splash = True, mirror = True),
+    "Pyro": Special(multiplier = 1.5, splash = True),
+    "Gura": Special(multiplier = 2),
+    "Nimbus": Special(splash = True),
+    "Maria": Special(multiplier = 2.5),
+    "Raijin": Special(multiplier = 2.5),
+    "Axim": Special(drain = 0.3),
+    "Rex": Special(shield = 0.5),
+    "Ninji": Special(multiplier = 2.5)
+}
+
+def perform_special(user, move, target, opponents, allies):
+    """Perform a special move (for the player's and computer's warriors).
+
+    The target is ignored by splash specials. The damage rolls are made in the
+    same order for every warrior with the same kind of special: splash
+    specials roll for all 3 opponents first (unless the opponents use their
+    own power) and shields are rolled with the damage, before any is dealt.
 
-        if self.tag == "p":
-            print(self.special_name,
-                  "\n" + self.special_desc)
+    """
 
-            while True:
-                choice = input("Perform your special? (y/n) ")
+    randint = user.rng.randint
 
-                if choice == "y": break
-                elif choice == "n": return
-                else: print("Please choose a living warrior to attack.")
+    #the special will drain the user's charge instead of charging it
+    user.charge -= user.cost
 
-        self.charge -= self.cost
+    if move.splash:
+        if not move.mirror:
+            damages = [
+                int(move.multiplier * user.power * randint(80, 120) / 100),
+                int(move.multiplier * user.power * randint(80, 120) / 100),
+                int(move.multiplier * user.power * randint(80, 120) / 100)
+            ]
 
-        if self.tag == "p": summoner = computer
-        else: summoner = player
+        damage_no = 0
 
-        for warrior in summoner.team:
+        #all warriors on the opposing team are attacked
+        for warrior in opponents:
             if warrior.alive == True:
-                damage = int(warrior.power * randint(80, 120) /100)
+                if move.mirror:
+                    damage = int(move.multiplier * warrior.power
+                                 * randint(80, 120) / 100)
+                else: damage = damages[damage_no]
+
                 warrior.health -= damage
                 warrior.charge += 1
-                print(self.name, "used", self.special_name, "on", warrior.name,
-                      "and dealt", damage, "damage!")
+                output(user.name, "used", user.special_name, "on",
+                       warrior.name, "and dealt", damage, "damage!")
+            damage_no += 1
 
-        return True
+        return
+
+    damage = int((move.multiplier * user.power + target.health * move.drain)
+                 * randint(80, 120) / 100)
+
+    if move.shield:
+        shields = [int(move.shield * user.power * randint(80, 120) / 100),
+                   int(move.shield * user.power * randint(80, 120) / 100),
+                   int(move.shield * user.power * randint(80, 120) / 100)]
+
+    #only the damage that the target had health left for is healed
+    heal = int(move.heal * min(damage, target.health))
+
+    target.health -= damage
+    target.charge += 1
+
+    output(user.name, "used", user.special_name, "on", target.name,
+           "and dealt", damage, "damage!")
+
+    if move.heal:
+        user.health += heal
+        output(user.name, "healed", heal, "health!")
+
+    if move.shield:
+        shield_no = 0
+
+        for warrior in allies:
+            if warrior.alive == True:
+                shield = shields[shield_no]
+                warrior.health += shield
+                warrior.charge += 1
+                output(user.name, "used", user.special_name, "on",
+                       warrior.name, "and shielded", shield, "health!")
+            shield_no += 1
 
 def summon(available_warriors):
     """Summon 6 warriors at random from the list of available warriors."""
@@ -1085,11 +711,11 @@ def summon(available_warriors):
 
     return warriors, available_warriors
 
-def order_set(warriors):
+def order_set(warriors, rng = random):
     """Return a list of warriors is decending speed order."""
 
     #warriors are shuffled to break speed ties fairly
-    shuffle(warriors)
+    rng.shuffle(warriors)
 
     #warriors are sorted by the sort() method
     warriors.sort(key = lambda w: w.speed, reverse =  True)
@@ -1109,7 +735,7 @@ def defeat_check(warriors):
             warrior.health = 0
             warrior.charge = 0
             warrior.alive = False
-            print(warrior.name, "has been defeated!")
+            output(warrior.name, "has been defeated!")
 
 def end_check(player, computer):
     """Check if a team has been defeated.
@@ -1209,6 +835,166 @@ def win_check(player, computer):
 
     return points
 
+def silence(*args, **kwargs):
+    """Discard a battle message (the sink used for headless battles)."""
+
+@contextmanager
+def headless(sink = None):
+    """Send the battle messages to the sink inside a with block.
+
+    The sink takes the same arguments as print(). If there is no sink, the
+    messages are discarded. The previous output is restored afterwards, even
+    if the block raises.
+
+    """
+
+    global output
+
+    previous = output
+    output = sink or silence
+
+    try:
+        yield
+    finally:
+        output = previous
+
+def write_json(path, data):
+    """Write data to a JSON file (as used for the tools' caches).
+
+    The data is written to a temporary file first, so a crash while writing
+    will never corrupt the previous file.
+
+    """
+
+    temporary = path + ".tmp"
+
+    with open(temporary, "w") as file:
+        json.dump(data, file)
+
+    os.replace(temporary, path)
+
+def battle_seed(seed, index):
+    """Return the seed of a battle in a run of battles with a seed."""
+
+    return (seed << 32) + index
+
+def report(telemetry, warrior, allies, warriors, before, rounds):
+    """Send the events of a warrior's turn to the telemetry.
+
+    The events are found by comparing the warriors' health, charge and life
+    from before the turn (before, in the order of warriors) with their state
+    after the turn and the defeat check. The allies are the warrior's team.
+
+    """
+
+    #defeated warriors don't have turns
+    if not before[warriors.index(warrior)][2]: return
+
+    telemetry.turn(warrior)
+
+    for other, (health, charge, alive) in zip(warriors, before):
+        if other is warrior:
+            #only a special lowers the user's own charge
+            if other.charge <= charge: telemetry.special(warrior, warrior.cost)
+
+        elif other not in allies:
+            #defeated warriors have no health, so overkill isn't counted
+            if other.health < health:
+                telemetry.damage(warrior, other, health - other.health)
+
+            if alive and not other.alive:
+                telemetry.kill(warrior, other, rounds)
+
+def battle(team0, team1, ai0 = None, ai1 = None, rng = None, log = None,
+           telemetry = None):
+    """Play a single battle between two computer-controlled teams.
+
+    Both summoners are tagged "c", so every warrior chooses its own moves with
+    target_set() and special_save(), or with its team's AI if it has one.
+
+    Warrior.turn() treats its first summoner as the opposing team, so each
+    warrior is given the summoners in the order of its own side.
+
+    All random numbers come from the battle's RNG (a new random.Random if none
+    is given). A log (see GOZI2Replay) records the battle's moves and its
+    final state, and a telemetry object (see GOZI2Telemetry) is sent the
+    events of every turn (see report()).
+
+    The survivor counts of both teams are returned (as in win_check()).
+
+    """
+
+    if rng is None: rng = random.Random()
+
+    side0 = Summoner("c", ai0, rng, log)
+    side1 = Summoner("c", ai1, rng, log)
+    side0.team_build(team0)
+    side1.team_build(team1)
+
+    warriors = side0.team + side1.team
+    if log: log.start(warriors)
+    if telemetry: telemetry.start(warriors)
+
+    rounds = 0
+
+    while True:
+        warriors = order_set(warriors, rng)
+        rounds += 1
+
+        #the AIs are told the round's turn order
+        side0.order = side1.order = warriors
+
+        for warrior in warriors:
+            if warrior in side0.team: allies, opponents = side0, side1
+            else: allies, opponents = side1, side0
+
+            if telemetry:
+                before = [(w.health, w.charge, w.alive) for w in warriors]
+
+            warrior.turn(opponents, allies)
+            defeat_check(warriors)
+
+            if telemetry:
+                report(telemetry, warrior, allies.team, warriors, before,
+                       rounds)
+
+            if end_check(side0, side1):
+                if log: log.finish(side0.team + side1.team)
+                if telemetry: telemetry.finish(side0.team, side1.team, rounds)
+                return win_check(side0, side1)
+
+def simulate(team0, team1, battles, sink = None, ai0 = None, ai1 = None,
+             seed = None, telemetry = None):
+    """Play a number of headless battles between two teams.
+
+    The teams are lists of warrior names (as in warrior_names), and either
+    team can be given an AI.
+
+    All battle messages are sent to the sink, which takes the same arguments
+    as print(). If there is no sink, the messages are discarded.
+
+    If there is a seed, each battle's RNG is seeded with battle_seed() of the
+    seed and the battle's index, so any battle of the run can be reproduced.
+
+    The events of every battle are sent to the telemetry if there is one.
+
+    The number of wins of both teams is returned.
+
+    """
+
+    wins = [0, 0]
+
+    with headless(sink):
+        for i in range(battles):
+            if seed is None: rng = random.Random()
+            else: rng = random.Random(battle_seed(seed, i))
+
+            if battle(team0, team1, ai0, ai1, rng, None, telemetry)[0]:
+                wins[0] += 1
+            else: wins[1] += 1
+
+    return wins
+
 def main():
     """Start a new game of GOZI 2."""
 
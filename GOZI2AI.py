@@ -0,0 +1,657 @@
+#!/usr/bin/env python3
+
+"""Lookahead AI for GOZI 2's computer-controlled warriors.
+
+An AI is given to a summoner (Summoner("c", ai)) and chooses the moves of all
+of its warriors with choose(), in place of target_set() and special_save().
+
+The Expectimax AI searches the next turns of the battle: its own warriors
+choose the move (attack or special) and target with the best expected value,
+and the opponents play as the default computer does (target_set() and
+special_save()), which is the policy of every computer without an AI.
+
+The turns are searched in the battle's real turn order: the rest of the
+current round is known (battle() gives it to the summoners), and each new
+round is a chance node over its possible orders, as order_set() shuffles the
+warriors with the same speed.
+
+The damage rolls (80% to 120% of the power) are a chance node with two
+outcomes for each warrior that is hit: it is defeated (with the exact chance
+of a roll that defeats it) or it survives the mean of the rolls that don't.
+Warriors that can't be defeated by the hit only have the second outcome, so
+most hits don't branch.
+
+The search looks DEPTH turns ahead (a full round of 6 warriors), and each
+decision has a budget of NODES search nodes (states and rollout turns)
+instead of a time limit, so its time is bounded while its move only depends
+on the battle state. A search that runs out of nodes is abandoned and the
+default computer's move is played, as the moves of shallower searches are
+often worse than it. The states that the search reaches are valued by a
+rollout, in which both teams play the rest of the battle as the default
+computer does. The AI only plays differently from the default computer when
+the search finds a move that is better by at least its gain (GAIN), so it
+improves on the default computer's policy rather than replacing it.
+
+Battle states that are reached by different move orders (or that only differ
+in which of two same-named teammates is which) are recognised with
+state_key() and their values are kept in a TranspositionTable, which is
+shared by all of the AI's decisions (and battles) and by AIs with the same
+settings. The table only returns values searched to the same depth, and
+each value is charged the nodes that it took to search, so neither the AI's
+values nor its budget depend on what it searched before, and a seeded battle
+is the same whenever it is played.
+"""
+
+import gc
+import time
+import math
+import random
+import itertools
+import functools
+from collections import OrderedDict
+
+import GOZI2
+import GOZI2Arrays
+
+DEPTH = 6 # The number of turns searched (a full round of 6 warriors).
+NODES = 800 # The most search nodes (states and rollout turns) of a decision.
+TABLE_SIZE = 20000 # The maximum number of states in the transposition table.
+LOW, HIGH = 80, 120 # The lowest and highest damage rolls (percent).
+
+WIN = 1000.0 # The value of a won battle (and minus a lost battle).
+ROLLOUT_VALUE = 100.0 # The value of a rollout that is won with no health lost.
+ROLLOUT = 200 # The most turns of a rollout.
+GAIN = 0.5 # The least gain for which the AI doesn't play the default move.
+
+BATTLES = 200 # The number of battles of each matchup and side in main().
+MATCHUPS = 6 # The number of matchups in main().
+SEED = 0 # The seed of main()'s matchups and battles.
+
+class OutOfNodes(Exception):
+    """Raised inside a search when the decision's node budget is used up."""
+
+def hit(base, health):
+    """Return the chance that a hit defeats a warrior, and its mean damage otherwise.
+
+    The hit deals int(base * roll / 100) damage, with a roll of LOW to HIGH.
+
+    """
+
+    if base <= 0: return 0.0, 0.0
+
+    # The lowest roll that deals at least the (whole) health.
+    first = min(max(math.ceil(100 * math.ceil(health) / base - 1e-9), LOW),
+                HIGH + 1)
+
+    return (HIGH + 1 - first) / (HIGH - LOW + 1), base * (LOW + first - 1) / 200
+
+@functools.lru_cache(maxsize = None)
+def teammates(lineup):
+    """Return the positions of the warriors with the same name on each team.
+
+    Each group has at least 2 positions (most lineups have none).
+
+    """
+
+    return tuple(
+        same for first in (0, 3) for name in set(lineup[first:first + 3])
+        for same in [[i for i in range(first, first + 3) if lineup[i] == name]]
+        if len(same) > 1
+    )
+
+def state_key(lineup, health, charge, pending):
+    """Return the canonical, hashable key of a battle state.
+
+    The lineup is the names of the 6 warriors (the AI's team first), which
+    fixes their stats. Defeated warriors have no health or charge, so the
+    health also records which warriors are alive.
+
+    Pending is the warriors that are still to act this round, in order.
+    Defeated warriors skip their turns, so they are dropped from it.
+
+    Warriors with the same name on the same team are interchangeable, so
+    their states are put in order of health (keeping the order of equal
+    health, as the default computer targets the first of them), and the
+    state with them swapped has the same key.
+
+    """
+
+    pending = tuple(i for i in pending if health[i])
+    groups = teammates(lineup)
+
+    if not groups:
+        return lineup, health, charge, pending
+
+    position = list(range(6))
+
+    # The positions of the same-named warriors are given their states in
+    # order of health.
+    for same in groups:
+        for new, old in zip(same, sorted(same, key = health.__getitem__)):
+            position[old] = new
+
+    if position != list(range(6)):
+        health = tuple(health[position.index(i)] for i in range(6))
+        charge = tuple(charge[position.index(i)] for i in range(6))
+        pending = [position[i] for i in pending]
+
+    return lineup, health, charge, tuple(pending)
+
+class TranspositionTable:
+    """A bounded table of the values of searched battle states.
+
+    Each entry is the value of a state searched to a number of turns, with
+    the number of search nodes that it took. When the table is full, the
+    least recently used entry is dropped.
+
+    The values depend on the settings of the AI that searched them (but not
+    on its depth, as each entry records its own), so a table belongs to the
+    settings of the first AI that is given it (see Expectimax.config).
+
+    """
+
+    def __init__(self, size = TABLE_SIZE):
+        """Create an empty table that holds up to size states."""
+
+        self.size = size
+        self.config = None
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        """Return the number of states in the table."""
+
+        return len(self.entries)
+
+    def get(self, key, depth):
+        """Return the value and node count of a state searched to depth turns.
+
+        None is returned if there is no such value in the table. A value
+        searched deeper isn't used, so the values (and the AI's moves) are
+        the same whatever the table held before.
+
+        """
+
+        entry = self.entries.get((key, depth))
+
+        if entry is not None:
+            self.entries.move_to_end((key, depth))
+            self.hits += 1
+            return entry
+
+        self.misses += 1
+
+    def put(self, key, depth, value, nodes):
+        """Store the value of a state searched to depth turns in nodes nodes."""
+
+        self.entries[key, depth] = (value, nodes)
+        self.entries.move_to_end((key, depth))
+
+        if len(self.entries) > self.size:
+            self.entries.popitem(last = False)
+
+class Expectimax:
+    """Depth-limited expectimax search over GOZI 2 battle states.
+
+    A battle state is the health and charge of all 6 warriors (as tuples) and
+    the living warriors that are still to act this round, in order. Warriors
+    0 to 2 are the AI's team and 3 to 5 are the opponents. Defeated warriors
+    have no health.
+
+    """
+
+    def __init__(self, depth = DEPTH, gain = GAIN, table = None,
+                 nodes = NODES):
+        """Create the AI with its search depth (in turns), least gain and
+        node budget for each decision.
+
+        A transposition table can be given to be shared with other AIs with
+        the same gain (a ValueError is raised if it belongs to another).
+
+        """
+
+        self.depth = depth
+        self.gain = gain
+        self.nodes = nodes
+        self.table = table if table is not None else TranspositionTable()
+
+        # The settings that the values of the table's states depend on.
+        self.config = (gain, ROLLOUT, ROLLOUT_VALUE, WIN)
+
+        if self.table.config is None:
+            self.table.config = self.config
+        elif self.table.config != self.config:
+            raise ValueError("The table belongs to an AI with other settings.")
+
+        # The search nodes used by the current decision.
+        self.used = 0
+
+        # Search statistics: the time of every decision and the number of
+        # searches that finished.
+        self.times = []
+        self.searched = 0
+
+    def choose(self, warrior, player, computer):
+        """Choose the move and target of one of the AI's warriors.
+
+        As in Warrior.turn(), player is the opposing summoner and computer is
+        the warrior's own summoner.
+
+        Returns whether to use the special and the target warrior.
+
+        If the search runs out of nodes, the default computer's move is
+        chosen instead.
+
+        """
+
+        start = time.perf_counter()
+
+        # The youngest objects are collected every decision. The table frees
+        # an old state for each new one, which cancels out the allocations
+        # that start collections, so the young objects would otherwise pile
+        # up for one very long collection.
+        gc.collect(0)
+
+        warriors = computer.team + player.team
+        self.setup(warriors)
+
+        health = tuple(w.health if w.alive else 0 for w in warriors)
+        charge = tuple(w.charge for w in warriors)
+        user = warriors.index(warrior)
+
+        # The warriors after this one in the round's turn order (none are
+        # known if the summoner wasn't given the order by battle()).
+        order = [warriors.index(w) for w in computer.order]
+        pending = tuple(order[order.index(user) + 1:] if user in order else ())
+
+        self.used = 0
+
+        try:
+            move = self.best(health, charge, user, pending, self.depth)[1]
+            self.searched += 1
+        except OutOfNodes:
+            move = self.default(health, charge, user)
+
+        self.times.append(time.perf_counter() - start)
+
+        return move[0], warriors[move[1]]
+
+    def spend(self, nodes):
+        """Charge search nodes to the decision's budget.
+
+        OutOfNodes is raised once the budget is used up.
+
+        """
+
+        self.used += nodes
+
+        if self.used > self.nodes:
+            raise OutOfNodes
+
+    def setup(self, warriors):
+        """Store the unchanging stats of the warriors for the search."""
+
+        self.lineup = tuple(w.name for w in warriors)
+        self.power = [w.power for w in warriors]
+        self.cost = [w.cost for w in warriors]
+        self.speed = [w.speed for w in warriors]
+        self.saves = [w.special_type == "attack" for w in warriors]
+        self.move = [GOZI2.special_moves[w.name] for w in warriors]
+        self.rounds = {}
+        self.rollouts = {}
+
+    def orders(self, health):
+        """Return the possible turn orders of a new round with their chances.
+
+        order_set() shuffles the warriors and sorts them by speed, so the
+        orders of warriors with the same speed are equally likely.
+
+        """
+
+        living = tuple(i for i in range(6) if health[i] > 0)
+
+        if living not in self.rounds:
+            groups = [
+                list(itertools.permutations(group))
+                for speed, group in itertools.groupby(
+                    sorted(living, key = lambda i: -self.speed[i]),
+                    key = lambda i: self.speed[i]
+                )
+            ]
+            orders = [sum(parts, ()) for parts in itertools.product(*groups)]
+            self.rounds[living] = [(1 / len(orders), order) for order in orders]
+
+        return self.rounds[living]
+
+    def moves(self, health, charge, user):
+        """Return all of the user's moves as (special, target) pairs."""
+
+        first = 3 if user < 3 else 0
+        targets = [i for i in range(first, first + 3) if health[i] > 0]
+        moves = [(False, target) for target in targets]
+
+        if charge[user] >= self.cost[user]:
+            # Splash specials don't have a single target.
+            if self.move[user].splash:
+                moves.append((True, targets[0]))
+            else:
+                moves.extend((True, target) for target in targets)
+
+        return moves
+
+    def default(self, health, charge, user):
+        """Return the move of the default computer (as in Warrior.turn())."""
+
+        first = 3 if user < 3 else 0
+        target = -1
+
+        for i in range(first, first + 3):
+            if health[i] > 0 and (
+                target < 0 or health[i] < health[target]
+                or (health[i] == health[target]
+                    and self.power[i] > self.power[target])
+            ):
+                target = i
+
+        special = charge[user] >= self.cost[user] and not (
+            self.saves[user] and health[target] <= self.power[user] * 0.8
+        )
+
+        return special, target
+
+    def outcomes(self, health, charge, user, move, likely = False):
+        """Return the outcomes of a move as (chance, health, charge) triples.
+
+        Each warrior that is hit is either defeated or survives the mean of
+        the rolls that don't defeat it (see hit()). Shields add their mean.
+        If likely is True, only the most likely outcome is returned.
+
+        """
+
+        health = list(health)
+        charge = list(charge)
+        special, target = move
+        power = self.power[user]
+        first = 3 if user < 3 else 0
+        heal = 0
+
+        if not special:
+            hits = [(target, power)]
+            charge[user] += 1
+
+        else:
+            move = self.move[user]
+            charge[user] -= self.cost[user]
+            heal = move.heal
+
+            if not move.splash:
+                hits = [(target, move.multiplier * power
+                         + health[target] * move.drain)]
+
+                if move.shield:
+                    for i in range(3 - first, 6 - first):
+                        if health[i] > 0:
+                            health[i] += move.shield * power
+                            charge[i] += 1
+
+            else:
+                # Mirrored specials make the opponents use their own power.
+                hits = [
+                    (i, move.multiplier
+                     * (self.power[i] if move.mirror else power))
+                    for i in range(first, first + 3) if health[i] > 0
+                ]
+
+        branches = [(1.0, health, charge)]
+
+        for target, base in hits:
+            chance, damage = hit(base, health[target])
+            split = []
+
+            # The more likely of the two (being defeated if they're even).
+            defeat = chance > 0 and (chance >= 0.5 or not likely)
+            survive = chance < 1 and (chance < 0.5 or not likely)
+
+            for probability, before, charged in branches:
+                if defeat:
+                    after = before[:]
+                    gained = charged[:]
+                    after[user] += heal * after[target]
+                    after[target] = 0
+                    gained[target] = 0
+                    split.append((probability * chance, after, gained))
+
+                if survive:
+                    after = before[:]
+                    gained = charged[:]
+                    after[user] += heal * damage
+                    # The health is a mean, so a surviving warrior keeps some.
+                    after[target] = max(after[target] - damage, 1)
+                    gained[target] += 1
+                    split.append((probability * (1 - chance), after, gained))
+
+            branches = split
+
+        return [(probability, tuple(after), tuple(gained))
+                for probability, after, gained in branches]
+
+    def evaluate(self, health, charge, pending):
+        """Return the heuristic value of a battle state from a rollout.
+
+        Both teams play the rest of the battle as the default computer does,
+        each move has its most likely outcome (see outcomes()) and new rounds
+        have the first of their possible orders. The winner's value is
+        ROLLOUT_VALUE times the fraction of its team's health left (and the
+        loser's is minus it), so the value changes smoothly from a narrow
+        loss to a narrow win.
+
+        A rollout ends the same way from every state that it passes through,
+        so the ending (the health left, negative if the AI's team lost) and
+        the turns left are kept for each of them until the next decision,
+        and later rollouts stop when they reach one of them. Each rollout is
+        still charged all of its turns.
+
+        """
+
+        total = [health[0] + health[1] + health[2],
+                 health[3] + health[4] + health[5]]
+        pending = list(pending)
+        path = []
+
+        while len(path) < ROLLOUT:
+            if not (health[3] or health[4] or health[5]):
+                left, turns = sum(health[:3]), 1
+                break
+            if not (health[0] or health[1] or health[2]):
+                left, turns = -sum(health[3:]), 1
+                break
+
+            key = (health, charge, tuple(pending))
+
+            if key in self.rollouts:
+                left, turns = self.rollouts[key]
+                break
+
+            path.append(key)
+
+            if not pending: pending = list(self.orders(health)[0][1])
+
+            user = pending.pop(0)
+
+            if not health[user]:
+                continue
+
+            move = self.default(health, charge, user)
+
+            if move[0]:
+                health, charge = self.outcomes(health, charge, user, move,
+                                               True)[0][1:]
+                continue
+
+            # Attacks (most turns) are played here, as outcomes() would play
+            # them but without its branches.
+            target = move[1]
+            chance, damage = hit(self.power[user], health[target])
+            health = list(health)
+            charge = list(charge)
+            charge[user] += 1
+
+            if chance >= 0.5:
+                health[target] = 0
+                charge[target] = 0
+            else:
+                health[target] = max(health[target] - damage, 1)
+                charge[target] += 1
+
+            health = tuple(health)
+            charge = tuple(charge)
+
+        else:
+            # The rollout didn't end, so it's a draw (and its states aren't
+            # kept, as their endings aren't known).
+            self.spend(ROLLOUT)
+            return 0.0
+
+        for i, key in enumerate(path):
+            self.rollouts[key] = (left, turns + len(path) - i)
+
+        turns += len(path)
+
+        # Rollouts that last more than ROLLOUT turns are a draw.
+        if turns > ROLLOUT:
+            self.spend(ROLLOUT)
+            return 0.0
+
+        self.spend(turns)
+
+        return ROLLOUT_VALUE * left / total[0 if left > 0 else 1]
+
+    def expected(self, health, charge, user, move, pending, depth):
+        """Return the expected value of a move, averaged over its outcomes."""
+
+        return sum(
+            probability * self.value(after, gained, pending, depth - 1)
+            for probability, after, gained
+            in self.outcomes(health, charge, user, move)
+        )
+
+    def best(self, health, charge, user, pending, depth):
+        """Return the best value and move of one of the AI's warriors.
+
+        The default computer's move is kept unless another move is better, so
+        the AI only plays differently when the search finds a gain.
+
+        """
+
+        move = self.default(health, charge, user)
+        best = (self.expected(health, charge, user, move, pending, depth), move)
+
+        for move in self.moves(health, charge, user):
+            if move != best[1]:
+                value = self.expected(health, charge, user, move, pending,
+                                      depth)
+
+                if value > best[0] + self.gain:
+                    best = (value, move)
+
+        return best
+
+    def value(self, health, charge, pending, depth):
+        """Return the value of a battle state with depth turns to search."""
+
+        self.spend(1)
+
+        if not (health[0] or health[1] or health[2]):
+            return -WIN
+        if not (health[3] or health[4] or health[5]):
+            return WIN
+        if depth == 0:
+            return self.evaluate(health, charge, pending)
+
+        key = state_key(self.lineup, health, charge, pending)
+
+        # A new round starts once every living warrior has acted.
+        if not key[3]:
+            return sum(
+                probability * self.value(health, charge, order, depth)
+                for probability, order in self.orders(health)
+            )
+
+        entry = self.table.get(key, depth)
+
+        # A state found in the table is charged the nodes of its search, so
+        # the budget runs out at the same point whatever the table held.
+        if entry is not None:
+            self.spend(entry[1])
+            return entry[0]
+
+        used = self.used
+
+        # Defeated warriors skip their turns.
+        while not health[pending[0]]: pending = pending[1:]
+
+        user = pending[0]
+
+        if user < 3:
+            value = self.best(health, charge, user, pending[1:], depth)[0]
+
+        else:
+            value = self.expected(health, charge, user,
+                                  self.default(health, charge, user),
+                                  pending[1:], depth)
+
+        self.table.put(key, depth, value, self.used - used)
+
+        return value
+
+def main():
+    """Compare the win rates of the Expectimax AI and the default computer.
+
+    Each side of each matchup is played by the AI and by the default computer
+    in the same seeded battles, so the difference in the win rates is the
+    AI's gain. The gains are shown with 2 standard errors (so a gain larger
+    than that isn't noise).
+
+    """
+
+    ai = Expectimax()
+    rng = random.Random(SEED)
+    names = GOZI2.warrior_names[:]
+    gains = []
+
+    for matchup in range(MATCHUPS):
+        rng.shuffle(names)
+        teams = (names[:3], names[3:6])
+
+        for side in (0, 1):
+            team, other = teams[side], teams[1 - side]
+            seed = SEED + 2 * matchup + side
+            default = GOZI2Arrays.simulate(team, other, BATTLES,
+                                           seed = seed)[0] / BATTLES
+            won = GOZI2.simulate(team, other, BATTLES, ai0 = ai,
+                                 seed = seed)[0] / BATTLES
+            variance = (won * (1 - won) + default * (1 - default)) / BATTLES
+            gains.append((won - default, variance))
+
+            print(", ".join(team), "vs", ", ".join(other) + ":",
+                  "default {:.1%}, AI {:.1%},".format(default, won),
+                  "gain {:+.1%} (+/- {:.1%})".format(won - default,
+                                                     2 * math.sqrt(variance)))
+
+    gain = sum(gain for gain, variance in gains) / len(gains)
+    error = math.sqrt(sum(variance for gain, variance in gains)) / len(gains)
+
+    print("Mean gain: {:+.1%} (+/- {:.1%})".format(gain, 2 * error))
+    # The decision times, with the tail that the node budget bounds.
+    times = sorted(ai.times)
+    print("Decision time (ms): mean {:.1f}, 99th percentile {:.1f}, "
+          "max {:.1f}".format(1000 * sum(times) / len(times),
+                              1000 * times[int(0.99 * len(times))],
+                              1000 * times[-1]))
+    print("Finished searches: {:.1%}".format(ai.searched / len(times)))
+    print("Table hits:", ai.table.hits, "Table misses:", ai.table.misses)
+
+# Not run when imported.
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,309 @@
+#!/usr/bin/env python3
+
+"""GOZI 2 battles with a compact struct-of-arrays battle state.
+
+The battle state stores the health, charge, power, speed, cost and life of
+all 6 warriors in flat lists (one entry per warrior) instead of a Warrior
+object each. Warriors 0 to 2 are on the first team and 3 to 5 are on the
+second team.
+
+The specials are table-driven: each warrior's name is mapped to a special
+function and its special move (from GOZI2.special_moves) in SPECIALS, and the
+functions act on the battle state with the warriors' indices.
+
+The battles are the same as GOZI2's headless battles: the same random numbers
+are drawn in the same order from the battle's RNG, so a battle started from
+the same seed gives the same result with both representations.
+
+The lists are made once per BattleState and refilled by reset(), so nothing
+is allocated per turn.
+"""
+
+import time
+import random
+
+import GOZI2
+
+# The stats of every warrior (health, power, speed, cost).
+STATS = GOZI2.stat_blocks
+
+# Warriors that save their specials (the "attack" special_type).
+SAVERS = {
+    name for name, warrior in GOZI2.warrior_classes.items()
+    if warrior.special_type == "attack"
+}
+
+def strike(state, user, target, move):
+    """Attack the target with the special move's power.
+
+    The power is a multiple of the user's power plus a fraction of the
+    target's health (drain). The user may heal part of the damage, and every
+    living ally may be shielded (the shields are rolled with the damage).
+
+    """
+
+    randint = state.rng.randint
+    power = state.power[user]
+    health = state.health
+    charge = state.charge
+
+    damage = int((move.multiplier * power + health[target] * move.drain)
+                 * randint(80, 120) / 100)
+
+    if move.heal:
+        health[user] += int(move.heal * min(damage, health[target]))
+
+    if move.shield:
+        shield0 = int(move.shield * power * randint(80, 120) / 100)
+        shield1 = int(move.shield * power * randint(80, 120) / 100)
+        shield2 = int(move.shield * power * randint(80, 120) / 100)
+
+    health[target] -= damage
+    charge[target] += 1
+    charge[user] -= state.cost[user]
+
+    if move.shield:
+        first = 0 if user < 3 else 3
+        alive = state.alive
+
+        if alive[first]:
+            health[first] += shield0
+            charge[first] += 1
+        if alive[first + 1]:
+            health[first + 1] += shield1
+            charge[first + 1] += 1
+        if alive[first + 2]:
+            health[first + 2] += shield2
+            charge[first + 2] += 1
+
+def splash(state, user, target, move):
+    """Attack every living opponent with a multiple of the user's power.
+
+    The 3 damage rolls are made before the attack (one for each opponent,
+    even the defeated ones).
+
+    """
+
+    randint = state.rng.randint
+    power = move.multiplier * state.power[user]
+    damage0 = int(power * randint(80, 120) / 100)
+    damage1 = int(power * randint(80, 120) / 100)
+    damage2 = int(power * randint(80, 120) / 100)
+
+    state.charge[user] -= state.cost[user]
+
+    first = 3 if user < 3 else 0
+    health = state.health
+    charge = state.charge
+    alive = state.alive
+
+    if alive[first]:
+        health[first] -= damage0
+        charge[first] += 1
+    if alive[first + 1]:
+        health[first + 1] -= damage1
+        charge[first + 1] += 1
+    if alive[first + 2]:
+        health[first + 2] -= damage2
+        charge[first + 2] += 1
+
+def chaos(state, user, target, move):
+    """Make every living opponent attack itself with its own power."""
+
+    randint = state.rng.randint
+    state.charge[user] -= state.cost[user]
+
+    first = 3 if user < 3 else 0
+
+    for warrior in range(first, first + 3):
+        if state.alive[warrior]:
+            damage = int(
+                move.multiplier * state.power[warrior] * randint(80, 120) / 100
+            )
+            state.health[warrior] -= damage
+            state.charge[warrior] += 1
+
+# The special function and special move (GOZI2.special_moves) of every warrior.
+SPECIALS = {
+    name: (chaos if move.mirror else splash if move.splash else strike, move)
+    for name, move in GOZI2.special_moves.items()
+}
+
+class BattleState:
+    """The state of a battle between two teams, stored in flat lists.
+
+    Each list has one entry for each of the 6 warriors, and order holds the
+    warriors' indices in turn order.
+
+    """
+
+    def __init__(self):
+        """Create the lists for the battle state."""
+
+        self.rng = random
+        self.health = [0] * 6
+        self.charge = [0] * 6
+        self.power = [0] * 6
+        self.speed = [0] * 6
+        self.cost = [0] * 6
+        self.alive = [False] * 6
+        self.saves = [False] * 6
+        self.special = [None] * 6
+        self.move = [None] * 6
+        self.order = [0] * 6
+
+    def reset(self, team0, team1, rng):
+        """Refill the lists for a new battle between the teams.
+
+        The battle's random numbers are drawn from the RNG.
+
+        """
+
+        self.rng = rng
+
+        for index, name in enumerate(team0 + team1):
+            stats = STATS[name]
+            self.health[index] = stats[0]
+            self.power[index] = stats[1]
+            self.speed[index] = stats[2]
+            self.cost[index] = stats[3]
+            self.charge[index] = 0
+            self.alive[index] = True
+            self.saves[index] = name in SAVERS
+            self.special[index], self.move[index] = SPECIALS[name]
+            self.order[index] = index
+
+    def target(self, user):
+        """Return the computer's target for the user.
+
+        As in Warrior.target_set(), the living opponent with the lowest health
+        is chosen, with ties going to the greater power and then to the
+        earlier team position.
+
+        """
+
+        first = 3 if user < 3 else 0
+        health = self.health
+        power = self.power
+        best = -1
+
+        for warrior in range(first, first + 3):
+            if self.alive[warrior] and (
+                best < 0 or health[warrior] < health[best]
+                or (health[warrior] == health[best]
+                    and power[warrior] > power[best])
+            ):
+                best = warrior
+
+        return best
+
+    def turn(self, user):
+        """Perform the computer-controlled turn of the user."""
+
+        if not self.alive[user]:
+            return
+
+        target = self.target(user)
+
+        if self.charge[user] >= self.cost[user] and not (
+            self.saves[user]
+            and self.health[target] <= self.power[user] * 0.8
+        ):
+            self.special[user](self, user, target, self.move[user])
+
+        else:
+            damage = int(self.power[user] * self.rng.randint(80, 120) / 100)
+            self.health[target] -= damage
+            self.charge[target] += 1
+            self.charge[user] += 1
+
+    def defeat_check(self):
+        """Defeat every warrior with no health left."""
+
+        for warrior in range(6):
+            if self.health[warrior] <= 0 and self.alive[warrior]:
+                self.health[warrior] = 0
+                self.charge[warrior] = 0
+                self.alive[warrior] = False
+
+    def survivors(self):
+        """Return the survivor counts of both teams."""
+
+        alive = self.alive
+
+        return [
+            alive[0] + alive[1] + alive[2],
+            alive[3] + alive[4] + alive[5]
+        ]
+
+    def play(self):
+        """Play the battle to the end and return the survivor counts."""
+
+        alive = self.alive
+        order = self.order
+        speed = self.speed
+
+        while True:
+            # The same shuffle and stable sort as order_set().
+            self.rng.shuffle(order)
+            order.sort(key = speed.__getitem__, reverse = True)
+
+            for warrior in order:
+                self.turn(warrior)
+                self.defeat_check()
+
+                if (not (alive[0] or alive[1] or alive[2])
+                        or not (alive[3] or alive[4] or alive[5])):
+                    return self.survivors()
+
+def simulate(team0, team1, battles, state = None, seed = None):
+    """Play a number of battles between two teams (as GOZI2.simulate()).
+
+    A battle state can be given to be reused. The battles' RNGs are seeded
+    in the same way as GOZI2.simulate().
+    The number of wins of both teams is returned.
+
+    """
+
+    if state is None:
+        state = BattleState()
+
+    wins = [0, 0]
+
+    for i in range(battles):
+        if seed is None: rng = random.Random()
+        else: rng = random.Random(GOZI2.battle_seed(seed, i))
+
+        state.reset(team0, team1, rng)
+
+        if state.play()[0]: wins[0] += 1
+        else: wins[1] += 1
+
+    return wins
+
+def main():
+    """Compare the results and speed of both battle representations."""
+
+    names = GOZI2.warrior_names[:]
+    random.seed(0)
+    matchups = []
+
+    for i in range(100):
+        random.shuffle(names)
+        matchups.append((names[:3], names[3:6]))
+
+    results = []
+
+    for engine in (GOZI2.simulate, simulate):
+        start = time.time()
+        results.append([
+            engine(team0, team1, 50, seed = index)
+            for index, (team0, team1) in enumerate(matchups)
+        ])
+        print(engine.__module__, 5000 / (time.time() - start), "battles/s")
+
+    print("Same results:", results[0] == results[1])
+
+# Not run when imported.
+if __name__ == "__main__":
+    main()
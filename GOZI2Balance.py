@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+
+"""GOZI 2 balance tuner.
+
+The stat blocks (health, power, speed and cost) of the warriors are tuned so
+that every warrior's overall win rate is as close to 50% as possible.
+
+A stat table is scored by playing batched headless battles (GOZI2Batch)
+between random teams. The battles are split into tasks that are shared
+between a pool of processes, and the loss of the table is the sum of the
+squared differences between each warrior's win rate and 50%.
+
+The tuner is a hill climber: each iteration changes one stat of one warrior
+(preferring the warriors furthest from 50%, which are weakened or
+strengthened as needed) and keeps the change if it lowers the loss.
+A candidate is played against the best table on the same tasks (the same
+seeds and teams), a few tasks at a time, and the comparison stops as soon as
+the confidence intervals of their losses separate, or after MAX_TASKS.
+
+Every table's results are cached in the CACHE file, so a table is never
+played on the same task twice, even in a later run (with the same
+TASK_BATTLES and SEED, which the tasks are made from).
+"""
+
+import os
+import json
+import multiprocessing
+
+import numpy as np
+
+import GOZI2
+import GOZI2Batch
+
+ITERATIONS = 100 # The number of candidate tables tried.
+TASK_BATTLES = 20000 # The number of battles in each task.
+MAX_TASKS = 24 # The most tasks used to compare two tables.
+Z = 2.0 # The number of standard errors needed to separate two losses.
+SEED = 0 # The seed of the tuner (and the base seed of the tasks).
+PROCESSES = None # The number of worker processes (None for all cores).
+CACHE = "GOZI2Balance.json" # The file that the results are cached in.
+
+STEPS = np.array([50, 10, 10, 1]) # The change in each stat (health, etc.).
+MINIMUMS = np.array([100, 10, 1, 1]) # The lowest value of each stat.
+
+# The sign of a stat change that strengthens a warrior (a lower cost is better).
+STRONGER = np.array([1, 1, 1, -1])
+
+def play(task):
+    """Play a task's battles with a stat table.
+
+    The task is the stat table (as nested tuples) and the task's seed.
+    Each battle is between 2 random teams of different warriors.
+
+    The wins and battles of every warrior are returned.
+
+    """
+
+    stats, seed = task
+    rng = np.random.default_rng(seed)
+    names = len(GOZI2.warrior_names)
+
+    # The first 6 of a random permutation of the warriors in each battle.
+    warriors = np.argsort(rng.random((TASK_BATTLES, names)), axis = 1)[:, :6]
+    survivors = GOZI2Batch.play(warriors, rng, np.array(stats))
+    won = survivors[:, 0] > 0
+
+    wins = (
+        np.bincount(warriors[won, :3].ravel(), minlength = names)
+        + np.bincount(warriors[~won, 3:].ravel(), minlength = names)
+    )
+    battles = np.bincount(warriors.ravel(), minlength = names)
+
+    return wins, battles
+
+class Score:
+    """The results of a stat table over its first tasks."""
+
+    def __init__(self, tasks = 0, wins = None, battles = None):
+        """Create the score (empty unless results are given)."""
+
+        names = len(GOZI2.warrior_names)
+        self.tasks = tasks
+        self.wins = np.zeros(names) if wins is None else np.array(wins)
+        self.battles = (np.zeros(names) if battles is None
+                        else np.array(battles))
+
+    def rates(self):
+        """Return the win rate of every warrior."""
+
+        return self.wins / self.battles
+
+    def loss(self):
+        """Return the sum of the squared distances of the win rates from 50%."""
+
+        return ((self.rates() - 0.5) ** 2).sum()
+
+    def error(self):
+        """Return the standard error of the loss (by the delta method)."""
+
+        rates = self.rates()
+        variances = rates * (1 - rates) / self.battles
+
+        return np.sqrt(((2 * (rates - 0.5)) ** 2 * variances).sum())
+
+class Tuner:
+    """A hill climber over stat tables with cached, parallel scoring."""
+
+    def __init__(self, pool, processes):
+        """Create the tuner with a process pool and load the cache.
+
+        The tables are compared processes tasks at a time.
+
+        """
+
+        self.pool = pool
+        self.processes = processes
+        self.rng = np.random.default_rng(SEED)
+        self.scores = {}
+        self.load()
+
+    def load(self):
+        """Load every table's results from the cache (if there are any).
+
+        The tasks are made from TASK_BATTLES and SEED, so a cache from a run
+        with different settings is ignored.
+
+        """
+
+        if not os.path.exists(CACHE):
+            return
+
+        with open(CACHE) as file:
+            cache = json.load(file)
+
+        if (cache.get("battles") != TASK_BATTLES
+                or cache.get("seed") != SEED):
+            print("The cache doesn't match the current settings.")
+            return
+
+        for key, value in cache["scores"].items():
+            self.scores[key] = Score(*value)
+
+    def save(self):
+        """Save every table's results to the cache (see GOZI2.write_json())."""
+
+        GOZI2.write_json(
+            CACHE,
+            {
+                "battles": TASK_BATTLES,
+                "seed": SEED,
+                "scores": {
+                    key: [score.tasks, score.wins.tolist(),
+                          score.battles.tolist()]
+                    for key, score in self.scores.items()
+                }
+            }
+        )
+
+    def score(self, stats, tasks):
+        """Return the score of a stat table over (at least) its first tasks.
+
+        Only the tasks that haven't been played with the table are played.
+
+        """
+
+        key = json.dumps(stats.tolist())
+        score = self.scores.setdefault(key, Score())
+
+        if score.tasks < tasks:
+            table = tuple(map(tuple, stats.tolist()))
+            jobs = [(table, SEED * 1000003 + task)
+                    for task in range(score.tasks, tasks)]
+
+            for wins, battles in self.pool.imap_unordered(play, jobs):
+                score.wins += wins
+                score.battles += battles
+
+            score.tasks = tasks
+
+        return score
+
+    def candidate(self, stats, rates):
+        """Return a copy of the stat table with one stat changed.
+
+        The warrior is picked with a probability that grows with its
+        distance from a 50% win rate, and is strengthened if its win rate is
+        below 50% (or weakened if above).
+
+        """
+
+        distances = np.abs(rates - 0.5) + 1e-9
+        warrior = self.rng.choice(len(rates), p = distances / distances.sum())
+        stat = self.rng.integers(4)
+        sign = STRONGER[stat] if rates[warrior] < 0.5 else -STRONGER[stat]
+
+        stats = stats.copy()
+        stats[warrior, stat] = max(
+            MINIMUMS[stat], stats[warrior, stat] + sign * STEPS[stat]
+        )
+
+        return stats
+
+    def compare(self, candidate, best):
+        """Return whether the candidate has a lower loss than the best table.
+
+        Both tables are played on the same tasks, a few at a time, until the
+        confidence intervals of their losses separate.
+
+        """
+
+        step = max(2, self.processes)
+        tasks = 0
+
+        while tasks < MAX_TASKS:
+            tasks = min(tasks + step, MAX_TASKS)
+            new = self.score(candidate, tasks)
+            old = self.score(best, tasks)
+            error = np.hypot(new.error(), old.error())
+
+            if abs(new.loss() - old.loss()) > Z * error:
+                break
+
+        return new.loss() < old.loss()
+
+    def tune(self, stats):
+        """Tune the stat table for ITERATIONS iterations and return it."""
+
+        best = stats
+
+        for iteration in range(ITERATIONS):
+            score = self.score(best, 2)
+            candidate = self.candidate(best, score.rates())
+
+            if (candidate != best).any() and self.compare(candidate, best):
+                best = candidate
+
+            print(iteration, "Loss:", self.score(best, 2).loss())
+            self.save()
+
+        return best
+
+def main():
+    """Tune the stat blocks and display the tuned stat blocks."""
+
+    processes = PROCESSES or multiprocessing.cpu_count()
+
+    with multiprocessing.Pool(processes) as pool:
+        stats = Tuner(pool, processes).tune(GOZI2Batch.STATS.copy())
+
+    for name, block in zip(GOZI2.warrior_names, stats.tolist()):
+        print(name, "Health: {} Power: {} Speed: {} Cost: {}".format(*block))
+
+# Not run when imported.
+if __name__ == "__main__":
+    main()
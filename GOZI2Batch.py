@@ -0,0 +1,315 @@
+#!/usr/bin/env python3
+
+"""Batched GOZI 2 battles with NumPy.
+
+Thousands of independent headless battles are advanced in lockstep. The
+health, charge and life of the warriors are stored in (K, 6) arrays for K
+battles, with warriors 0 to 2 on the first team and 3 to 5 on the second.
+
+Each round, the turn order of every battle is found with one sort (speed
+descending, with random tie breaks as in order_set()), and only the battles
+with speed ties are sorted again. Each of the 6 turns of the round is then
+played in every battle at once with array operations: the targets of both
+teams are found from the warriors' health and power without a search, the
+damage rolls of the round are drawn before it, and the defeat and end
+checks only look at the warriors that were hit. The finished battles are
+removed from the arrays once a quarter of them have finished, even in the
+middle of a round.
+
+The rules are the same as GOZI2's headless battles, but the random numbers
+are drawn differently, so the results only agree statistically.
+"""
+
+import time
+
+import numpy as np
+
+import GOZI2
+
+BATCH = 20000 # The default number of battles played at once.
+
+# Columns of the stats table.
+HEALTH, POWER, SPEED, COST = range(4)
+
+# The stats (health, power, speed, cost) of every warrior, in warrior_names order.
+STATS = np.array(
+    [GOZI2.stat_blocks[name] for name in GOZI2.warrior_names],
+    dtype = np.int64
+)
+
+# The fields of every warrior's special move (GOZI2.special_moves), in
+# warrior_names order.
+MOVES = [GOZI2.special_moves[name] for name in GOZI2.warrior_names]
+MULTIPLIERS = np.array([move.multiplier for move in MOVES], dtype = float)
+SPLASHES = np.array([move.splash for move in MOVES])
+DRAINS = np.array([move.drain for move in MOVES], dtype = float)
+MIRRORS = np.array([move.mirror for move in MOVES])
+HEALS = np.array([move.heal for move in MOVES], dtype = float)
+SHIELDS = np.array([move.shield for move in MOVES], dtype = float)
+SAVERS = np.array([GOZI2.warrior_classes[name].special_type == "attack"
+                   for name in GOZI2.warrior_names])
+
+# The offsets of the 3 warriors of a team from its first warrior.
+TEAM = np.arange(3)
+
+def indices(team):
+    """Return the warrior_names indices of a team of warrior names."""
+
+    return [GOZI2.warrior_names.index(name) for name in team]
+
+def roll(multiplier, power, rolls):
+    """Return the damage of multiplier * power with the rolled percentages.
+
+    The truncation matches int() in GOZI2.
+
+    """
+
+    return np.trunc(multiplier * power * rolls / 100).astype(np.int64)
+
+def play(warriors, rng, stats = STATS):
+    """Play the battles to the end and return the survivor counts.
+
+    warriors is a (K, 6) array of warrior_names indices: one row per battle,
+    with the first team in columns 0 to 2. rng is a numpy.random.Generator.
+    A different stats table can be given to test new stat blocks.
+
+    A (K, 2) array of the survivor counts of both teams is returned.
+
+    """
+
+    survivors = np.zeros((len(warriors), 2), dtype = np.int64)
+
+    # The rows of the battles in the arrays (in survivors).
+    battles = np.arange(len(warriors))
+
+    health = stats[warriors, HEALTH]
+    power = stats[warriors, POWER]
+    speed = stats[warriors, SPEED]
+    cost = stats[warriors, COST]
+    # The warrior_names indices that the special moves are looked up with.
+    moves = np.array(warriors)
+    saves = SAVERS[warriors]
+    charge = np.zeros(warriors.shape, dtype = np.int64)
+    alive = np.ones(warriors.shape, dtype = bool)
+    running = np.ones(len(warriors), dtype = bool)
+
+    # Speed descending. The order only changes between rounds in battles with
+    # speed ties, which have their ties broken randomly every round.
+    order = np.argsort(-speed, axis = 1, kind = "stable")
+    tied = (np.diff(np.take_along_axis(speed, order, axis = 1)) == 0).any(axis = 1)
+    # Subtracted from the targeting keys (see below).
+    rank = power + 1
+
+    while len(battles):
+        # The random tie breaks of order_set(). The random fractions are too
+        # small to change the order of different speeds.
+        rows = np.flatnonzero(tied)
+        order[rows] = np.argsort(
+            rng.random((len(rows), 6)) * 0.5 - speed[rows], axis = 1
+        )
+
+        # The damage rolls of the whole round are drawn at once, one for each
+        # turn of each battle (with the battles in the last axis). Only the
+        # splash specials and shields, which need 3 rolls, draw their own.
+        rolls = rng.integers(80, 121, size = (6, len(battles)),
+                             dtype = np.int16)
+
+        for step in range(6):
+            count = len(battles)
+
+            # The turns are played on flat views of the arrays, so a warrior
+            # is indexed by 6 * its battle's row + its column.
+            flat_health = health.ravel()
+            flat_charge = charge.ravel()
+            flat_alive = alive.ravel()
+            flat_power = power.ravel()
+            flat_cost = cost.ravel()
+            flat_saves = saves.ravel()
+            flat_moves = moves.ravel()
+            base = np.arange(0, 6 * count, 6)
+
+            # Only the battles where the warrior can act are played.
+            column = order[:, step]
+            acting = np.flatnonzero(running & flat_alive[base + column])
+            column = column[acting]
+            user = base[acting] + column
+            # The opposing team (1 for the first team's warriors).
+            across = column < 3
+            first = user - column + 3 * across
+
+            # The living opponent with the lowest health is targeted, with ties
+            # broken by the greater power and then the earlier team position.
+            # The target of both teams of every battle is found at once, from
+            # the (K, 2, 3) keys of the teams' warriors (the strict
+            # comparisons keep the first of equal keys). Defeated warriors
+            # have no health, so their keys are negative, which are larger
+            # than every living warrior's key as unsigned numbers.
+            keys = ((health << 16) - rank).view(np.uint64).reshape(count, 2, 3)
+            second = (keys[:, :, 1] < keys[:, :, 0]).view(np.int8)
+            third = (
+                keys[:, :, 2] < np.minimum(keys[:, :, 0], keys[:, :, 1])
+            ).view(np.int8)
+            best = second + third * (2 - second)
+            target = first + best.ravel()[2 * acting + across]
+
+            user_power = flat_power[user]
+            target_health = flat_health[target]
+            special = (flat_charge[user] >= flat_cost[user]) & ~(
+                flat_saves[user] & (target_health <= user_power * 0.8)
+            )
+
+            # Attacks (most turns) are played with integer arithmetic, which
+            # truncates as int() in GOZI2 does. They charge the user and the
+            # target.
+            chosen = np.flatnonzero(~special)
+            hit = target[chosen]
+            flat_health[hit] -= (
+                user_power[chosen] * rolls[step, acting[chosen]] // 100
+            )
+            flat_charge[hit] += 1
+            flat_charge[user[chosen]] += 1
+
+            # The specials.
+            chosen = np.flatnonzero(special)
+            special_user = user[chosen]
+            special_column = column[chosen]
+            special_target = target[chosen]
+            special_power = user_power[chosen]
+            move = flat_moves[special_user]
+            special_rolls = rolls[step, acting[chosen]]
+            splash = SPLASHES[move]
+
+            # Specials use up the user's charge.
+            flat_charge[special_user] -= flat_cost[special_user]
+
+            # Targeted specials damage the target, with a multiple of the
+            # user's power and a fraction of the target's health (drain).
+            one = np.flatnonzero(~splash)
+            target_health = flat_health[special_target[one]]
+            damage = np.trunc(
+                (MULTIPLIERS[move[one]] * special_power[one]
+                 + target_health * DRAINS[move[one]])
+                * special_rolls[one] / 100
+            ).astype(np.int64)
+            flat_health[special_target[one]] -= damage
+            flat_charge[special_target[one]] += 1
+
+            # Healing specials heal part of the damage that the target had
+            # health left for.
+            healed = np.flatnonzero(HEALS[move[one]] > 0)
+            flat_health[special_user[one[healed]]] += np.trunc(
+                HEALS[move[one[healed]]]
+                * np.minimum(damage[healed], target_health[healed])
+            ).astype(np.int64)
+
+            # Shield specials shield every living ally.
+            shield = one[SHIELDS[move[one]] > 0]
+            shielded = (special_user[shield] - special_column[shield]
+                        + 3 * (special_column[shield] >= 3))[:, None] + TEAM
+            shielded_alive = flat_alive[shielded]
+            flat_health[shielded] += roll(
+                SHIELDS[move[shield], None], special_power[shield, None],
+                rng.integers(80, 121, size = (len(shield), 3))
+            ) * shielded_alive
+            flat_charge[shielded] += shielded_alive
+
+            # Splash specials damage every living opponent (with their own
+            # power if the special mirrors it).
+            many = np.flatnonzero(splash)
+            splashed = (first[chosen[many]])[:, None] + TEAM
+            hit_power = np.where(
+                MIRRORS[move[many], None],
+                flat_power[splashed], special_power[many, None]
+            )
+            hit_alive = flat_alive[splashed]
+            flat_health[splashed] -= roll(
+                MULTIPLIERS[move[many], None], hit_power,
+                rng.integers(80, 121, size = (len(many), 3))
+            ) * hit_alive
+            flat_charge[splashed] += hit_alive
+
+            # The defeat check (only the warriors that were hit can have been
+            # defeated) and the end check (only in the battles where a
+            # warrior was defeated).
+            hit = np.concatenate((target, splashed.ravel()))
+            defeated = hit[flat_health[hit] <= 0]
+            defeated = defeated[flat_alive[defeated]]
+            flat_health[defeated] = 0
+            flat_charge[defeated] = 0
+            flat_alive[defeated] = False
+
+            # A battle ends when a team (3 warriors in a row of the flat
+            # arrays) has no living warriors left.
+            ended = ~flat_alive.reshape(-1, 3)[defeated // 3].any(axis = 1)
+            running[defeated[ended] // 6] = False
+
+            # The finished battles are recorded and removed from the arrays
+            # (even in the middle of a round) once enough of them have
+            # finished for the copying to be worthwhile, so the later turns
+            # are only played on the battles that are left.
+            if ended.any() and running.sum() <= 0.75 * count:
+                finished = ~running
+                survivors[battles[finished], 0] = alive[finished, :3].sum(axis = 1)
+                survivors[battles[finished], 1] = alive[finished, 3:].sum(axis = 1)
+
+                battles = battles[running]
+                health = health[running]
+                power = power[running]
+                rank = rank[running]
+                speed = speed[running]
+                cost = cost[running]
+                moves = moves[running]
+                saves = saves[running]
+                charge = charge[running]
+                alive = alive[running]
+                order = order[running]
+                tied = tied[running]
+                rolls = rolls[:, running]
+                running = running[running]
+
+    return survivors
+
+def simulate(team0, team1, battles, rng = None, batch = BATCH):
+    """Play a number of battles between two teams (as GOZI2.simulate()).
+
+    The battles are played in batches of up to batch battles at once.
+    The number of wins of both teams is returned.
+
+    """
+
+    if rng is None:
+        rng = np.random.default_rng()
+
+    warriors = np.array(indices(team0) + indices(team1))
+    wins = [0, 0]
+
+    for start in range(0, battles, batch):
+        size = min(batch, battles - start)
+        survivors = play(np.tile(warriors, (size, 1)), rng)
+        won = int((survivors[:, 0] > 0).sum())
+        wins[0] += won
+        wins[1] += size - won
+
+    return wins
+
+def main():
+    """Compare the results and speed of the batched and per-object battles."""
+
+    team0 = ["Norman", "Maria", "Rex"]
+    team1 = ["Raijin", "Kasime", "FiveStar"]
+
+    start = time.time()
+    wins = GOZI2.simulate(team0, team1, 5000)
+    rate = 5000 / (time.time() - start)
+    print("GOZI2:", wins, int(rate), "battles/s")
+
+    start = time.time()
+    batch_wins = simulate(team0, team1, 100000, np.random.default_rng(0))
+    batch_rate = 100000 / (time.time() - start)
+    print("GOZI2Batch:", batch_wins, int(batch_rate), "battles/s")
+
+    print("Speedup:", batch_rate / rate)
+
+# Not run when imported.
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+
+"""GOZI 2 matchup matrix.
+
+Every team of 3 warriors is battled against every other team that it could
+meet in a game of GOZI 2 (the teams share no warriors, as all 6 summoned
+warriors are different). Each matchup is played BATTLES times with headless
+battles between two computer-controlled teams.
+
+Both teams are controlled by the same computer logic, so a matchup is only
+played once (team A against team B gives the win rate of B against A too).
+
+The matchups are shared between a pool of processes. Each matchup's battles
+are seeded from SEED and the matchup's index, so the results are reproducible
+no matter which worker plays the matchup or in which order they finish, and
+any single battle can be replayed (see GOZI2Replay).
+
+The results are merged as they arrive and saved to the CHECKPOINT file every
+CHECKPOINT_INTERVAL matchups. A run that is stopped can be resumed from the
+checkpoint, and only the matchups that are missing will be played.
+
+When every matchup has been played, the win rate table is written to TABLE
+and each warrior's overall win rate is displayed.
+"""
+
+import os
+import json
+import multiprocessing
+from itertools import combinations
+
+import GOZI2
+
+BATTLES = 1000 # The number of battles played for each matchup.
+SEED = 0 # The base seed of every matchup's RNG.
+PROCESSES = None # The number of worker processes (None for all cores).
+CHUNK_SIZE = 16 # The number of matchups sent to a worker at once.
+CHECKPOINT = "GOZI2Matrix.json" # The file used to save progress.
+CHECKPOINT_INTERVAL = 500 # The number of matchups played between saves.
+TABLE = "GOZI2Matrix.csv" # The file that the win rate table is written to.
+
+def teams():
+    """Return every team of 3 warriors (in a fixed order)."""
+
+    return list(combinations(GOZI2.warrior_names, 3))
+
+def matchups(all_teams):
+    """Return the index pairs of all teams that can battle each other.
+
+    Teams can't share a warrior, and each pair is only listed once.
+
+    """
+
+    pairs = []
+
+    for i in range(len(all_teams)):
+        for j in range(i + 1, len(all_teams)):
+            if not set(all_teams[i]) & set(all_teams[j]):
+                pairs.append((i, j))
+
+    return pairs
+
+def play(job):
+    """Play all of the battles of a single matchup.
+
+    The job is the matchup's index and its two teams.
+    The index and the wins of both teams are returned.
+
+    """
+
+    index, team0, team1 = job
+
+    # The matchup's own seed makes it reproducible in any worker.
+    seed = SEED * 1000003 + index
+
+    return index, GOZI2.simulate(list(team0), list(team1), BATTLES,
+                                 seed = seed)
+
+def load(pairs):
+    """Load the results saved in the checkpoint (if there are any).
+
+    A checkpoint from a run with different settings is ignored.
+
+    """
+
+    if not os.path.exists(CHECKPOINT):
+        return {}
+
+    with open(CHECKPOINT) as file:
+        checkpoint = json.load(file)
+
+    if (checkpoint["battles"] != BATTLES or checkpoint["seed"] != SEED
+            or checkpoint["matchups"] != len(pairs)):
+        print("The checkpoint doesn't match the current settings.")
+        return {}
+
+    return {int(index): wins for index, wins in checkpoint["results"].items()}
+
+def save(results, pairs):
+    """Save the results to the checkpoint (see GOZI2.write_json())."""
+
+    GOZI2.write_json(
+        CHECKPOINT,
+        {
+            "battles": BATTLES,
+            "seed": SEED,
+            "matchups": len(pairs),
+            "results": results
+        }
+    )
+
+def write_table(all_teams, pairs, results):
+    """Write the win rate of every matchup to the table (a CSV file)."""
+
+    with open(TABLE, "w") as file:
+        file.write("team0,team1,wins0,wins1,win_rate0\n")
+
+        for index, (i, j) in enumerate(pairs):
+            wins = results[index]
+            file.write(
+                "{},{},{},{},{:.4f}\n".format(
+                    " ".join(all_teams[i]), " ".join(all_teams[j]),
+                    wins[0], wins[1], wins[0] / sum(wins)
+                )
+            )
+
+def warrior_rates(all_teams, pairs, results):
+    """Return each warrior's win rate over all of the battles it was in."""
+
+    wins = dict.fromkeys(GOZI2.warrior_names, 0)
+    played = dict.fromkeys(GOZI2.warrior_names, 0)
+
+    for index, (i, j) in enumerate(pairs):
+        teams_wins = zip((all_teams[i], all_teams[j]), results[index])
+
+        for team, team_wins in teams_wins:
+            for name in team:
+                wins[name] += team_wins
+                played[name] += sum(results[index])
+
+    return {name: wins[name] / played[name] for name in wins}
+
+def main():
+    """Play every missing matchup and write the win rate table."""
+
+    all_teams = teams()
+    pairs = matchups(all_teams)
+    results = load(pairs)
+
+    jobs = [
+        (index, all_teams[i], all_teams[j])
+        for index, (i, j) in enumerate(pairs)
+        if index not in results
+    ]
+
+    print(len(pairs) - len(jobs), "of", len(pairs), "matchups already played.")
+
+    with multiprocessing.Pool(PROCESSES) as pool:
+        for index, wins in pool.imap_unordered(play, jobs, CHUNK_SIZE):
+            results[index] = wins
+
+            # The results are saved periodically, so a run can be resumed.
+            if len(results) % CHECKPOINT_INTERVAL == 0:
+                save(results, pairs)
+                print(len(results), "of", len(pairs), "matchups played.")
+
+    save(results, pairs)
+    write_table(all_teams, pairs, results)
+
+    rates = warrior_rates(all_teams, pairs, results)
+
+    for name in sorted(rates, key = rates.get, reverse = True):
+        print(name, "{:.2%}".format(rates[name]))
+
+# Not run when imported.
+if __name__ == "__main__":
+    main()
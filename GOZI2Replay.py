@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+
+"""Replay logs for GOZI 2 battles.
+
+A Recorder is given to GOZI2.battle() as both the battle's RNG and its log.
+It draws the random numbers from a seeded random.Random and records every
+turn order, move and damage roll into a compact binary log, followed by the
+final state of all 6 warriors.
+
+A Replayer re-simulates a log: it is given to GOZI2.battle() as the RNG, the
+log and the AI of both teams, so the recorded turn orders, rolls and moves
+are played back without any search or random numbers. When the battle ends,
+its final state is verified against the recorded one.
+
+A suspicious battle from a large seeded run can be recorded again from its
+seed with record() (as the battle is fully determined by the seed), and the
+log can then be kept and replayed quickly and exactly with replay().
+
+The log is a header (the magic bytes and the warrior_names indices of the 6
+warriors) and one byte for most events:
+
+    0 to 40: a damage roll of 80 to 120.
+    64 to 99: a move (64 + 6 * actor + 3 * special + target team position).
+    128: a turn order, followed by the 6 warriors' indices in order.
+    255: the end of the battle, followed by the final state of each warrior
+         (health, charge and life).
+"""
+
+import time
+import random
+import struct
+
+import GOZI2
+
+MAGIC = b"GZ2R" # The first bytes of every log.
+MOVE = 64 # The first move byte.
+ORDER = 128 # The turn order byte.
+END = 255 # The end of battle byte.
+WARRIOR_STATE = struct.Struct("<ihB") # Health, charge and life.
+
+class ReplayError(Exception):
+    """Raised when a replay doesn't match its log."""
+
+class Recorder:
+    """A battle RNG and log that records the battle into a replay log."""
+
+    def __init__(self, rng):
+        """Create the recorder to draw random numbers from the RNG."""
+
+        self.rng = rng
+        self.data = bytearray(MAGIC)
+
+    def start(self, warriors):
+        """Record the warriors at the start of the battle."""
+
+        self.warriors = warriors[:]
+        self.data += bytes(GOZI2.warrior_names.index(w.name) for w in warriors)
+
+    def randint(self, a, b):
+        """Draw and record a damage roll."""
+
+        roll = self.rng.randint(a, b)
+        self.data.append(roll - 80)
+
+        return roll
+
+    def shuffle(self, warriors):
+        """Shuffle the warriors and record the order."""
+
+        self.rng.shuffle(warriors)
+        self.data.append(ORDER)
+
+        # order_set()'s sort is stable, so the shuffled order fixes the turns.
+        self.data += bytes(self.warriors.index(w) for w in warriors)
+
+    def move(self, warrior, special, target):
+        """Record a computer-controlled move."""
+
+        actor = self.warriors.index(warrior)
+        self.data.append(
+            MOVE + 6 * actor + 3 * bool(special)
+            + self.warriors.index(target) % 3
+        )
+
+    def finish(self, warriors):
+        """Record the final state of the warriors."""
+
+        self.data.append(END)
+
+        for w in warriors:
+            self.data += WARRIOR_STATE.pack(w.health, w.charge, w.alive)
+
+class Replayer:
+    """A battle RNG, log and AI that plays back a replay log."""
+
+    def __init__(self, data):
+        """Read the log's header and prepare to play it back."""
+
+        if data[:4] != MAGIC:
+            raise ReplayError("Not a GOZI 2 replay log.")
+
+        self.data = data
+        self.teams = [
+            [GOZI2.warrior_names[i] for i in data[4:7]],
+            [GOZI2.warrior_names[i] for i in data[7:10]]
+        ]
+        self.position = 10
+        self.verified = False
+
+    def next(self):
+        """Return the next byte of the log."""
+
+        byte = self.data[self.position]
+        self.position += 1
+
+        return byte
+
+    def start(self, warriors):
+        """Store the warriors at the start of the battle."""
+
+        self.warriors = warriors[:]
+
+    def randint(self, a, b):
+        """Return the next recorded damage roll."""
+
+        byte = self.next()
+
+        if byte >= MOVE:
+            raise ReplayError("Expected a damage roll.")
+
+        return byte + 80
+
+    def shuffle(self, warriors):
+        """Put the warriors in the next recorded order."""
+
+        if self.next() != ORDER:
+            raise ReplayError("Expected a turn order.")
+
+        warriors[:] = [self.warriors[self.next()] for i in range(6)]
+
+    def choose(self, warrior, player, computer):
+        """Return the next recorded move (as an AI)."""
+
+        byte = self.next() - MOVE
+
+        if not 0 <= byte < 36 or self.warriors[byte // 6] is not warrior:
+            raise ReplayError("Expected a move by " + warrior.name + ".")
+
+        return bool(byte % 6 // 3), player.team[byte % 3]
+
+    def move(self, warrior, special, target):
+        """Moves are already in the log, so they aren't recorded again."""
+
+    def finish(self, warriors):
+        """Verify the final state of the warriors against the log."""
+
+        if self.next() != END:
+            raise ReplayError("The battle ended before the log.")
+
+        for w in warriors:
+            state = WARRIOR_STATE.unpack_from(self.data, self.position)
+            self.position += WARRIOR_STATE.size
+
+            if state != (w.health, w.charge, w.alive):
+                raise ReplayError(w.name + "'s final state doesn't match.")
+
+        self.verified = True
+
+def record(team0, team1, seed, ai0 = None, ai1 = None):
+    """Record a headless battle with a seed and return its replay log.
+
+    With the seed from GOZI2.battle_seed(), the battle is the same battle as
+    the one in a seeded GOZI2.simulate() run. This holds for battles with a
+    GOZI2AI.Expectimax AI as well, as its moves only depend on the battle
+    state (its budget is a number of search nodes rather than a time, and
+    its table only returns values of exact depths, charged the nodes that
+    they took), even if its table was shared with the earlier battles.
+
+    """
+
+    recorder = Recorder(random.Random(seed))
+
+    with GOZI2.headless():
+        GOZI2.battle(team0, team1, ai0, ai1, recorder, recorder)
+
+    return bytes(recorder.data)
+
+def replay(data, sink = None):
+    """Re-simulate a replay log and verify its final state.
+
+    The battle messages are sent to the sink (as in GOZI2.simulate()).
+    The survivor counts of both teams are returned.
+
+    """
+
+    replayer = Replayer(data)
+
+    with GOZI2.headless(sink):
+        survivors = GOZI2.battle(replayer.teams[0], replayer.teams[1],
+                                 replayer, replayer, replayer, replayer)
+
+    if not replayer.verified or replayer.position != len(data):
+        raise ReplayError("The log wasn't fully replayed.")
+
+    return survivors
+
+def main():
+    """Record a battle of a seeded run and replay it."""
+
+    team0 = ["Norman", "Maria", "Rex"]
+    team1 = ["Raijin", "Kasime", "FiveStar"]
+
+    # Battle 7 of a run of GOZI2.simulate(team0, team1, battles, seed = 42).
+    data = record(team0, team1, GOZI2.battle_seed(42, 7))
+    print("Log size:", len(data), "bytes")
+
+    start = time.time()
+
+    for i in range(1000):
+        replay(data)
+
+    print("Replays per second:", 1000 / (time.time() - start))
+    replay(data, print)
+
+# Not run when imported.
+if __name__ == "__main__":
+    main()
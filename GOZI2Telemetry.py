@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+
+"""Battle telemetry for GOZI 2.
+
+A Statistics object is given to GOZI2.battle() (or GOZI2.simulate()) as its
+telemetry, and is sent an event for every turn, damage dealt, special used
+(with the charge spent) and defeat (with the kill credit) of the battle.
+
+The events are never kept: they are added to running totals for each warrior
+as they arrive, so the memory used is the same for a single battle or for
+millions of them. The totals give each warrior's:
+
+    DPS: the mean damage dealt per turn.
+    Special rate: the fraction of its turns that it used its special on.
+    Survival curve: the fraction of its battles that it was still alive in
+                    after each round (up to MAX_ROUNDS rounds).
+
+Statistics can be merged, so the battles can be shared between a pool of
+processes (see main()) and the totals of each process added together.
+"""
+
+import random
+import multiprocessing
+
+import GOZI2
+
+TASKS = 100 # The number of tasks shared between the processes.
+TASK_BATTLES = 10000 # The number of battles in each task.
+SEED = 0 # The base seed of every task.
+PROCESSES = None # The number of worker processes (None for all cores).
+MAX_ROUNDS = 30 # The number of rounds in the survival curves.
+
+class Statistics:
+    """Constant memory running totals of battle events for every warrior."""
+
+    def __init__(self):
+        """Create the statistics with no battles."""
+
+        names = len(GOZI2.warrior_names)
+        self.index = {name: i for i, name in enumerate(GOZI2.warrior_names)}
+
+        self.battles = [0] * names
+        self.wins = [0] * names
+        self.turns = [0] * names
+        self.dealt = [0] * names
+        self.specials = [0] * names
+        self.charge = [0] * names
+        self.kills = [0] * names
+
+        #the defeats of each warrior in each round (the last counts the later
+        #rounds too)
+        self.defeats = [[0] * (MAX_ROUNDS + 1) for i in range(names)]
+
+    def start(self, warriors):
+        """Count a new battle for each of the warriors."""
+
+        for w in warriors:
+            self.battles[self.index[w.name]] += 1
+
+    def turn(self, warrior):
+        """Count a turn of the warrior."""
+
+        self.turns[self.index[warrior.name]] += 1
+
+    def damage(self, warrior, target, amount):
+        """Count damage dealt to the target by the warrior."""
+
+        self.dealt[self.index[warrior.name]] += amount
+
+    def special(self, warrior, charge):
+        """Count a special used by the warrior and the charge spent."""
+
+        i = self.index[warrior.name]
+        self.specials[i] += 1
+        self.charge[i] += charge
+
+    def kill(self, warrior, target, rounds):
+        """Credit the warrior with the target's defeat in a round."""
+
+        self.kills[self.index[warrior.name]] += 1
+        self.defeats[self.index[target.name]][min(rounds, MAX_ROUNDS)] += 1
+
+    def finish(self, team0, team1, rounds):
+        """Count a win for each warrior of the winning team."""
+
+        if any(w.alive for w in team0): winners = team0
+        else: winners = team1
+
+        for w in winners:
+            self.wins[self.index[w.name]] += 1
+
+    def merge(self, other):
+        """Add the totals of other statistics to these."""
+
+        for name in ("battles", "wins", "turns", "dealt", "specials",
+                     "charge", "kills"):
+            totals = getattr(self, name)
+
+            for i, value in enumerate(getattr(other, name)):
+                totals[i] += value
+
+        for defeats, others in zip(self.defeats, other.defeats):
+            for r, value in enumerate(others):
+                defeats[r] += value
+
+    def dps(self, name):
+        """Return the warrior's mean damage dealt per turn."""
+
+        i = self.index[name]
+        return self.dealt[i] / self.turns[i]
+
+    def special_rate(self, name):
+        """Return the fraction of the warrior's turns that used its special."""
+
+        i = self.index[name]
+        return self.specials[i] / self.turns[i]
+
+    def survival(self, name):
+        """Return the warrior's survival curve.
+
+        Item r of the curve is the fraction of the warrior's battles that it
+        was still alive in after round r (item 0 is the start of the battle).
+        Warriors that survive their battle are alive after every round.
+
+        """
+
+        i = self.index[name]
+        alive = self.battles[i]
+        curve = []
+
+        for defeats in self.defeats[i]:
+            alive -= defeats
+            curve.append(alive / self.battles[i])
+
+        return curve
+
+    def win_rate(self, name):
+        """Return the fraction of the warrior's battles that it won."""
+
+        i = self.index[name]
+        return self.wins[i] / self.battles[i]
+
+def play(task):
+    """Play a task's battles between random teams and return the statistics.
+
+    The task is the task's index, which seeds the teams and every battle.
+
+    """
+
+    statistics = Statistics()
+    seed = SEED * 1000003 + task
+    teams = random.Random(seed)
+
+    with GOZI2.headless():
+        for i in range(TASK_BATTLES):
+            names = teams.sample(GOZI2.warrior_names, 6)
+            rng = random.Random(GOZI2.battle_seed(seed, i))
+            GOZI2.battle(names[:3], names[3:], rng = rng,
+                         telemetry = statistics)
+
+    return statistics
+
+def main():
+    """Play the tasks' battles and display each warrior's statistics."""
+
+    statistics = Statistics()
+
+    with multiprocessing.Pool(PROCESSES) as pool:
+        for task_statistics in pool.imap_unordered(play, range(TASKS)):
+            statistics.merge(task_statistics)
+
+    print(sum(statistics.battles) // 6, "battles played.")
+
+    for name in GOZI2.warrior_names:
+        curve = statistics.survival(name)
+
+        print(name,
+              "Win rate: {:.2%}".format(statistics.win_rate(name)),
+              "DPS: {:.1f}".format(statistics.dps(name)),
+              "Special rate: {:.2%}".format(statistics.special_rate(name)),
+              "Survival (rounds 2, 4, 6, 8):",
+              " ".join("{:.2f}".format(curve[r]) for r in (2, 4, 6, 8)))
+
+# Not run when imported.
+if __name__ == "__main__":
+    main()
@@ -18,19 +18,25 @@ to plot on the graph. However, this version of the plotter also
 includes a grid from (-10, -10) to (10, 10) (bigger than the old
 plotter that went from (-8, -8) to (8, 8). The gridlines are also
 displayed.
+
+The graph can be panned by dragging it with the mouse and zoomed
+with the mouse wheel. The plots are drawn in tiles that are cached
+for each zoom level, so only the tiles that come into view are
+drawn. The tiles are drawn by a pool of processes in the background
+(PlotTools.TileRenderer), so the display never waits for them.
 """
 
 import pygame
-import time
 import random
-import PygameTools
-from math import (
-    e, exp, log, expm1, log1p,
-    pi, sin, cos, tan, asin, acos, atan,
-    sinh, cosh, tanh, asinh, acosh, atanh,
-)
+import numpy as np
+import PlotTools
 
 DISPLAY_SIZE = (500, 500)
+VIEW = (-10, 10, -10, 10) # The left, right, bottom and top of the grid at first.
+FRAME_RATE = 60 # The most frames per second.
+TILE_CACHE = 50000 # The most function tiles that are cached.
+COMPOSITE_CACHE = 256 # The most finished tiles (of all the functions) that are cached.
+GRID_SPACING = 20 # The fewest pixels between gridlines.
 WEAK_WHITE = (255, 255, 255, 51)
 BLACK = (0, 0, 0)
 
@@ -40,8 +46,8 @@ class FunctionOfX:
     A function will be of x and any other symbols
     must have been predefined (like e or pi).
 
-    Each function will have a plotter that is a uniquely
-    coloured sprite (from PygameTools.Sprite).
+    Each function will have a unique colour that it is
+    rasterized into the display's pixels with.
 
     The unique colours are maintained by having a class
     variable (a list) that will update as colours are taken.
@@ -58,12 +64,8 @@ class FunctionOfX:
 
     def __init__(self, function):
         """Create the function object with an original plotter."""
-        # f(x) is set
-        try:
-            self.f = lambda x: eval(function)
-        except:
-            print("Function was not understood.")
-            self.f = lambda x: 0
+        # f(x) is compiled once, and is f(x) = 0 if it isn't valid.
+        self.f = PlotTools.compile_function(function)
 
         while True:
             colour = (
@@ -73,36 +75,21 @@ class FunctionOfX:
             )
 
             if self.colour_check(colour):
-                self.plotter = PygameTools.Sprite(
-                    PygameTools.rect_surface((1, 1), colour)
-                )
+                self.colour = colour
                 break
 
-    def plot(self, surface):
-        """Plots the function to the surface."""
-        for x in range(
-            int(-surface.get_width()/2),
-            int(surface.get_width()/2)
-        ):
-            # If the point can't be plotted, it is skipped.
-            try:
-                self.plotter.rect.topleft = (
-                    # The plots are determined by the origin
-                    # The origin is in the middle (half width and height).
-                    int(surface.get_width()/2 + x),
-                    # Division by 25 to set x between -10 and 10.
-                    # Multiplication by 25 to get the graph back to
-                    # the correct size.
-                    int(surface.get_height()/2 - 25*self.f(x/25))
-                )
-            # 'Wildcard except' for exceptions of any kind.
-            except:
-                pass
-            else:
-                self.plotter.blit_to(surface)
-                # Assumption that the surface is the display.
-                # Makes a nice visual of the graph being drawn.
-                pygame.display.flip()
+    def plot(self, pixels, tile, level, tiles):
+        """Plots the function into the pixels of a tile at a zoom level.
+
+        The function's pixels in the tile are looked up in the tiles
+        cache (keyed by the function, tile and zoom level), and True
+        is returned if they have been drawn.
+        """
+        covered = tiles.get((self, tile, level))
+
+        if covered is not None:
+            pixels.reshape(-1, 3)[covered] = self.colour
+            return True
 
     @classmethod
     def colour_check(cls, colour):
@@ -112,49 +99,67 @@ class FunctionOfX:
             print("Colour:", colour)
             return True
 
-def ln(x):
-    """Return the natural logarithm of x.
+def draw_gridlines(surface, vert_line, hori_line, viewport):
+    """Draw the gridlines of the viewport onto the surface.
 
-    This function is identical to math.log() except
-    that it only accepts a single argument (hence the
-    separate definition instead of equation).
+    The gridlines are 1, 2 or 5 times a power of 10 apart
+    (whichever is the closest that is at least GRID_SPACING
+    pixels apart), so there are about as many at every zoom.
     """
-    return log(x)
+    power = 10**np.floor(np.log10(GRID_SPACING/viewport.scale))
 
-def draw_gridlines(surface, vert_line, hori_line):
-    """Draw 38 gridlines onto the surface.
+    for multiple in (1, 2, 5, 10):
+        spacing = multiple*power
+        if spacing*viewport.scale >= GRID_SPACING:
+            break
 
-    The gridlines are drawn from -9 to 9 on both axis
-    in white and the spacing is determined by the surface's size.
-    Therefore, the surface size can be changed without any
-    compatability worries.
-    """
-    # The sizes of the spaces between lines are calculated.
-    space = (
-        int(surface.get_width()/20),
-        int(surface.get_height()/20)
+    # The gridlines are found from the offset of the display.
+    step = spacing*viewport.scale
+    first = (
+        int(np.ceil(viewport.offset[0]/step)),
+        int(np.ceil(viewport.offset[1]/step))
     )
 
-    for i in range(1, 20):
-        # Two lines are drawn for each iteration.
-        surface.blit(vert_line, (i*space[0], 0))
-        surface.blit(hori_line, (0, i*space[1]))
+    for i in range(first[0], first[0] + int(viewport.size[0]/step) + 1):
+        surface.blit(vert_line, (round(i*step) - viewport.offset[0], 0))
 
-        # Creates a nice visual with blitting one by one
-        # (actually two by two).
-        time.sleep(0.01)
-        pygame.display.flip()
+    for i in range(first[1], first[1] + int(viewport.size[1]/step) + 1):
+        surface.blit(hori_line, (0, round(i*step) - viewport.offset[1]))
 
-def main():
-    """Start plotting."""
-    functions = []
+def draw_tiles(surface, functions, viewport, tiles, composites, renderer):
+    """Draw the viewport's tiles of all the functions onto the surface.
 
-    while len(functions) < 215:
-        function = input("f(x) = ")
-        if not function:
-            break
-        functions.append(FunctionOfX(function))
+    The function tiles that the renderer has drawn are cached, and
+    the ones that are missing are requested from the renderer (and
+    are left out until a later frame). Finished tiles (with every
+    function drawn) are cached in the composites cache.
+    """
+    for (tile, level), i, covered in renderer.collect():
+        tiles.put((functions[i], tile, level), covered)
 
+    for tile, position in viewport.tiles():
+        key = (tile, viewport.level)
+        image = composites.get(key)
+
+        if image is None:
+            pixels = np.zeros(
+                (PlotTools.TILE_SIZE, PlotTools.TILE_SIZE, 3), dtype=np.uint8
+            )
+            missing = [
+                i for i, f in enumerate(functions)
+                if not f.plot(pixels, tile, viewport.level, tiles)
+            ]
+            image = pygame.surfarray.make_surface(pixels)
+
+            if missing:
+                renderer.request(key, *viewport.tile_area(tile), missing)
+            else:
+                composites.put(key, image)
+
+        surface.blit(image, position)
+
+def plot(functions, renderer):
+    """Display the functions until escape is pressed."""
     pygame.init()
     display = pygame.display.set_mode(DISPLAY_SIZE)
 
@@ -164,16 +169,56 @@ def main():
     hori_line = pygame.Surface((display.get_width(), 1), pygame.SRCALPHA)
     hori_line.fill(WEAK_WHITE)
 
-    # Gridlines from -10 to 10 are drawn onto the display.
-    draw_gridlines(display, vert_line, hori_line)
-
-    for f in functions:
-        f.plot(display)
+    # The grid starts from -10 to 10.
+    viewport = PlotTools.Viewport(DISPLAY_SIZE, VIEW)
+    tiles = PlotTools.LRUCache(TILE_CACHE)
+    composites = PlotTools.LRUCache(COMPOSITE_CACHE)
+    clock = pygame.time.Clock()
+    dragging = False
 
     # The plot ceases to display when the escape key is pressed.
     while not pygame.key.get_pressed()[pygame.K_ESCAPE]:
-        pygame.event.pump()
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                pygame.quit()
+                return
+
+            # The graph is dragged with the left mouse button.
+            elif event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:
+                dragging = True
+            elif event.type == pygame.MOUSEBUTTONUP and event.button == 1:
+                dragging = False
+            elif event.type == pygame.MOUSEMOTION and dragging:
+                viewport.pan(*event.rel)
+
+            # The graph is zoomed around the mouse.
+            elif event.type == pygame.MOUSEWHEEL:
+                viewport.zoom(event.y, pygame.mouse.get_pos())
+
+        draw_tiles(display, functions, viewport, tiles, composites, renderer)
+        draw_gridlines(display, vert_line, hori_line, viewport)
+        pygame.display.flip()
+        clock.tick(FRAME_RATE)
+
     pygame.quit()
 
+def main():
+    """Start plotting."""
+    functions = []
+
+    while len(functions) < 215:
+        function = input("f(x) = ")
+        if not function:
+            break
+        functions.append(FunctionOfX(function))
+
+    # The processes are started before pygame is.
+    renderer = PlotTools.TileRenderer([f.f.text for f in functions])
+
+    try:
+        plot(functions, renderer)
+    finally:
+        renderer.close()
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,633 @@
+"""Useful classes and functions for the function plotters by E1Z0.
+
+The Expression class is a class for functions of x that are
+typed in by the user. An expression is parsed, checked and
+compiled once, and is then evaluated over a whole NumPy array
+of x values at once (instead of calling eval() for every x).
+
+Only arithmetic on x, numbers and the names in NAMES is allowed,
+so an expression can't contain any dangerous code.
+
+The rasterize() function draws a plot's points, and the line
+segments between them, straight into an array of pixels (in the
+layout of pygame.surfarray), so a whole plot is drawn at once
+instead of blitting a sprite for every point.
+
+The sample() function chooses the x values that a function is
+evaluated at: more where its plot curves (or jumps) and fewer
+where it is flat, so plots are more accurate with fewer
+evaluations. A view is the (left, right, bottom, top) edges of
+a plot, and to_pixels() converts points in it to pixels.
+
+The Viewport class is a class for the part of the plane that is
+shown on a display, which can be panned and zoomed. The plane
+is split into square tiles, and render_tile() draws a function
+into a tile (as the indices of its pixels), so tiles can be
+kept in an LRUCache and only the newly shown tiles are drawn.
+
+The TileRenderer class draws tiles in a pool of processes in the
+background, and returns them in shared memory, so drawing never
+holds up the display.
+"""
+
+import ast
+import queue
+import multiprocessing
+from multiprocessing import shared_memory, resource_tracker
+from collections import OrderedDict
+from functools import partial
+
+import numpy as np
+
+INITIAL_SAMPLES = 65 # The evenly spaced x values that sampling starts with.
+MAX_EVALUATIONS = 2000 # The most points that a function is sampled at.
+TOLERANCE = 0.5 # The furthest (in pixels) that a plot can be from its samples' lines.
+MIN_WIDTH = 1/64 # The narrowest (in pixels) that an interval between samples is split.
+MAX_JUMP = 4 # The furthest (in pixels) a plot can jump over MIN_WIDTH before it is broken.
+TILE_SIZE = 128 # The width and height of a tile in pixels.
+ZOOM = 1.25 # The change in scale of one zoom step.
+PROCESSES = None # The number of processes that draw tiles (None for all cores).
+TILE_BATCH = 16 # The most functions whose tile is drawn in one job.
+JOBS = 2 # The most jobs in the pool at once for each process.
+
+# The functions and constants that expressions can use.
+NAMES = {
+    "sin": np.sin, "cos": np.cos, "tan": np.tan,
+    "asin": np.arcsin, "acos": np.arccos, "atan": np.arctan,
+    "sinh": np.sinh, "cosh": np.cosh, "tanh": np.tanh,
+    "asinh": np.arcsinh, "acosh": np.arccosh, "atanh": np.arctanh,
+    "exp": np.exp, "log": np.log, "ln": np.log,
+    "expm1": np.expm1, "log1p": np.log1p,
+    "ceil": np.ceil, "floor": np.floor,
+    "sqrt": np.sqrt, "abs": np.abs,
+    "e": np.e, "pi": np.pi, "inf": np.inf, "nan": np.nan
+}
+
+# The syntax that expressions can use.
+NODES = (
+    ast.Expression, ast.BinOp, ast.UnaryOp, ast.Call, ast.Name,
+    ast.Constant, ast.Load,
+    ast.Add, ast.Sub, ast.Mult, ast.Div, ast.FloorDiv, ast.Mod,
+    ast.Pow, ast.UAdd, ast.USub
+)
+
+class Expression:
+    """Class for functions of x that are evaluated over arrays.
+
+    The expression's text is parsed into an AST that is checked
+    against NODES and NAMES, and is then compiled into a code
+    object, so the text is only parsed once.
+
+    Calling the expression with an array of x values returns an
+    array of the y values. Points where the function is undefined
+    (such as log(-1) or 1/0) are nan or inf instead of raising
+    exceptions.
+    """
+
+    def __init__(self, text):
+        """Create the expression from its text.
+
+        A ValueError is raised if the text isn't a valid expression
+        of x.
+        """
+        self.text = text
+
+        try:
+            tree = ast.parse(text, mode="eval")
+        except SyntaxError:
+            raise ValueError("Not an expression: " + text)
+        # Very deeply nested expressions are too much for the parser.
+        except (RecursionError, MemoryError):
+            raise ValueError("Too deeply nested to understand.")
+
+        # Numbers are evaluated as NumPy floats, so arithmetic on them
+        # follows the same rules as arithmetic on arrays.
+        self.namespace = {"__builtins__": {}}
+
+        # The names of the functions that are called (as only they can be
+        # functions).
+        called = {
+            id(node.func) for node in ast.walk(tree)
+            if isinstance(node, ast.Call)
+        }
+
+        for node in ast.walk(tree):
+            if not isinstance(node, NODES):
+                raise ValueError(
+                    "Not allowed in an expression: " + type(node).__name__
+                )
+
+            elif isinstance(node, ast.Name):
+                if node.id != "x" and node.id not in NAMES:
+                    raise ValueError("Unknown name: " + node.id)
+                elif callable(NAMES.get(node.id)) != (id(node) in called):
+                    raise ValueError("Misused name: " + node.id)
+                elif node.id != "x":
+                    self.namespace[node.id] = NAMES[node.id]
+
+            elif isinstance(node, ast.Call):
+                if (not isinstance(node.func, ast.Name) or node.keywords
+                        or len(node.args) != 1):
+                    raise ValueError("Only functions of one value are allowed.")
+
+            elif isinstance(node, ast.Constant):
+                if type(node.value) not in (int, float):
+                    raise ValueError("Only real numbers are allowed.")
+                elif abs(node.value) > 1e308:
+                    raise ValueError("Number too large: " + str(node.value))
+
+        try:
+            tree = NumberNamer(self.namespace).visit(tree)
+            self.code = compile(
+                ast.fix_missing_locations(tree), "<f(x)>", "eval"
+            )
+        except (RecursionError, MemoryError):
+            raise ValueError("Too deeply nested to understand.")
+
+    def __call__(self, x):
+        """Return the y values of an array of x values (as floats)."""
+        with np.errstate(all="ignore"):
+            y = eval(self.code, self.namespace, {"x": x})
+
+        y = np.asarray(y, dtype=float)
+
+        # Expressions that don't use x are constant.
+        if y.shape != np.shape(x):
+            y = np.full(np.shape(x), y)
+
+        return y
+
+class NumberNamer(ast.NodeTransformer):
+    """Replaces the numbers of an expression with names of NumPy floats."""
+
+    def __init__(self, namespace):
+        """Create the transformer to add the numbers to the namespace."""
+        self.namespace = namespace
+
+    def visit_Constant(self, node):
+        """Return a name for the number."""
+        name = "_" + str(len(self.namespace))
+        self.namespace[name] = np.float64(node.value)
+        return ast.copy_location(ast.Name(name, ast.Load()), node)
+
+def compile_function(text):
+    """Return the expression of the text, or f(x) = 0 if it's invalid.
+
+    The reason that the text isn't a valid expression is printed.
+    """
+    try:
+        return Expression(text)
+    except ValueError as error:
+        print("Function was not understood:", error)
+        return Expression("0")
+
+def rasterize(pixels, xs, ys, colour):
+    """Draw the points, joined by line segments, into the pixels.
+
+    The pixels are an array of shape (width, height, 3) indexed
+    by [x, y] (as from pygame.surfarray), and the points' x and y
+    values are in pixels. Points that are undefined (nan or inf)
+    aren't drawn, and neither are segments that end at them or
+    that jump further than the whole array (which are taken to be
+    discontinuities). Anything outside the array is clipped.
+    """
+    width, height = pixels.shape[:2]
+    xs = np.asarray(xs, dtype=float)
+    ys = np.asarray(ys, dtype=float)
+    defined = np.isfinite(xs) & np.isfinite(ys)
+
+    # The segments between neighbouring points.
+    dx = np.diff(xs)
+    dy = np.diff(ys)
+
+    with np.errstate(invalid="ignore"):
+        joined = (
+            defined[:-1] & defined[1:]
+            & (np.abs(dx) <= width) & (np.abs(dy) <= height)
+        )
+
+    # Each segment is drawn as one point per pixel along its longest
+    # side (from its start up to, but not including, its end).
+    steps = np.zeros(len(dx), dtype=int)
+    steps[joined] = np.ceil(
+        np.maximum(np.abs(dx[joined]), np.abs(dy[joined]))
+    )
+    segment = np.repeat(np.arange(len(steps)), steps)
+    step = np.arange(len(segment)) - np.repeat(np.cumsum(steps) - steps, steps)
+    t = step / np.maximum(steps, 1)[segment]
+
+    # Every defined point is drawn too (as some aren't in a segment).
+    px = np.concatenate((xs[segment] + t*dx[segment], xs[defined]))
+    py = np.concatenate((ys[segment] + t*dy[segment], ys[defined]))
+    px = np.rint(px)
+    py = np.rint(py)
+
+    inside = (px >= 0) & (px < width) & (py >= 0) & (py < height)
+    pixels[px[inside].astype(int), py[inside].astype(int)] = colour
+
+def to_pixels(xs, ys, view, size):
+    """Return the pixel positions of points in a view of a size.
+
+    The view is the (left, right, bottom, top) edges of the plot
+    and the size is the (width, height) of its pixels.
+    """
+    left, right, bottom, top = view
+    width, height = size
+
+    return (
+        (np.asarray(xs) - left) * width/(right - left),
+        (top - np.asarray(ys)) * height/(top - bottom)
+    )
+
+def sample(f, view, size, evaluations=MAX_EVALUATIONS, tolerance=TOLERANCE):
+    """Return x values and f's y values sampled adaptively over a view.
+
+    Sampling starts with INITIAL_SAMPLES evenly spaced x values,
+    and then every interval between samples is split at its
+    midpoint until the plot is within the tolerance (in pixels)
+    of the lines between the samples. Intervals where only some
+    of the samples are defined are split to find the edge of the
+    function's domain. Intervals are never split narrower than
+    MIN_WIDTH, and once the evaluations run out, the intervals
+    that were furthest from their lines are split first.
+
+    Intervals that are MIN_WIDTH wide and still jump more than
+    MAX_JUMP pixels in one of their halves are taken to be
+    asymptotes or discontinuities, and a nan y value is put in
+    them so they aren't joined.
+    """
+    left, right, bottom, top = view
+    width, height = size
+    x_scale = width/(right - left)
+
+    def pixels(ys):
+        """Return the heights of y values in pixels."""
+        return (ys - bottom) * height/(top - bottom)
+
+    xs = np.linspace(left, right, INITIAL_SAMPLES)
+    ys = f(xs)
+    found_x = [xs]
+    found_y = [ys]
+    remaining = evaluations - len(xs)
+
+    # The intervals that are still to be split (and how far their plots
+    # were from their lines, as they are split in that order).
+    a, b = xs[:-1], xs[1:]
+    fa, fb = ys[:-1], ys[1:]
+    errors = np.full(len(a), np.inf)
+
+    while len(a) and remaining > 0:
+        if len(a) > remaining:
+            worst = np.argsort(-errors, kind="stable")[:remaining]
+            a, b, fa, fb = a[worst], b[worst], fa[worst], fb[worst]
+
+        m = (a + b)/2
+        fm = f(m)
+        remaining -= len(m)
+        found_x.append(m)
+        found_y.append(fm)
+
+        pa, pb, pm = pixels(fa), pixels(fb), pixels(fm)
+        defined = (
+            np.isfinite(pa).astype(int) + np.isfinite(pb) + np.isfinite(pm)
+        )
+
+        # Far outside the view, the plot only needs to stay outside it.
+        with np.errstate(invalid="ignore"):
+            ca, cb, cm = (np.clip(p, -height, 2*height) for p in (pa, pb, pm))
+            errors = np.abs(cm - (ca + cb)/2)
+
+        # The edges of the domain are always looked for, and intervals
+        # that are undefined throughout are left alone.
+        errors[(defined > 0) & (defined < 3)] = np.inf
+        errors[defined == 0] = 0
+
+        wide = (b - a) * x_scale > MIN_WIDTH
+        split = wide & (errors > tolerance)
+
+        # A half of a narrow interval is broken if it jumps and has most
+        # of the interval's jump (each half of a steep line has half).
+        with np.errstate(invalid="ignore"):
+            whole = np.abs(pb - pa)
+
+            for start, end, jump in ((a, m, pm - pa), (m, b, pb - pm)):
+                jump = np.abs(jump)
+                broken = ~wide & (jump > MAX_JUMP) & (jump > 3/4*whole)
+                found_x.append((start[broken] + end[broken])/2)
+                found_y.append(np.full(broken.sum(), np.nan))
+
+        a = np.concatenate((a[split], m[split]))
+        b = np.concatenate((m[split], b[split]))
+        fa = np.concatenate((fa[split], fm[split]))
+        fb = np.concatenate((fm[split], fb[split]))
+        errors = np.concatenate((errors[split], errors[split]))
+
+    xs = np.concatenate(found_x)
+    order = np.argsort(xs, kind="stable")
+
+    return xs[order], np.concatenate(found_y)[order]
+
+class LRUCache:
+    """Class for a cache that drops its least recently used items.
+
+    Items are read with get() (which returns None for missing
+    items) and written with put(). Once there are more items
+    than the capacity, the least recently read or written item
+    is dropped.
+    """
+
+    def __init__(self, capacity):
+        """Create the empty cache with a capacity."""
+        self.capacity = capacity
+        self.items = OrderedDict()
+
+    def __len__(self):
+        """Return the number of items in the cache."""
+        return len(self.items)
+
+    def get(self, key):
+        """Return the item with the key (or None if it isn't cached)."""
+        if key not in self.items:
+            return None
+
+        self.items.move_to_end(key)
+        return self.items[key]
+
+    def put(self, key, item):
+        """Cache the item with the key."""
+        self.items[key] = item
+        self.items.move_to_end(key)
+
+        if len(self.items) > self.capacity:
+            self.items.popitem(last=False)
+
+class Viewport:
+    """Class for the part of the plane shown on a display.
+
+    The plane is measured in world pixels: the point (x, y) is at
+    (x*scale, -y*scale), and the display's top left corner is at
+    the offset (which is always a whole number of pixels, so the
+    tiles line up with the display's pixels).
+
+    The scale is only ever a whole number of zoom steps from the
+    first scale, and the level is the number of steps, so a tile
+    is always the same tile at the same level.
+    """
+
+    def __init__(self, size, view):
+        """Create the viewport to show the view on a display.
+
+        The view is the (left, right, bottom, top) edges of the
+        part of the plane shown at first (which is made to fit the
+        display's width).
+        """
+        left, right, bottom, top = view
+        self.size = size
+        self.base_scale = size[0]/(right - left)
+        self.level = 0
+        self.offset = (
+            round(left*self.base_scale),
+            round(-top*self.base_scale)
+        )
+
+    @property
+    def scale(self):
+        """The number of pixels in a unit of the plane."""
+        return self.base_scale * ZOOM**self.level
+
+    def view(self):
+        """Return the view shown on the display."""
+        return self.tile_view(self.offset, self.size)
+
+    def tile_view(self, corner, size=(TILE_SIZE, TILE_SIZE)):
+        """Return the view of the world pixels from a corner."""
+        return (
+            corner[0]/self.scale, (corner[0] + size[0])/self.scale,
+            -(corner[1] + size[1])/self.scale, -corner[1]/self.scale
+        )
+
+    def pan(self, dx, dy):
+        """Move the plane by a number of pixels (as if dragged)."""
+        self.offset = (self.offset[0] - dx, self.offset[1] - dy)
+
+    def zoom(self, steps, position):
+        """Zoom in by a number of steps (out if negative).
+
+        The point of the plane at the position on the display stays
+        at the position.
+        """
+        x = (self.offset[0] + position[0])/self.scale
+        y = (self.offset[1] + position[1])/self.scale
+        self.level += steps
+        self.offset = (
+            round(x*self.scale) - position[0],
+            round(y*self.scale) - position[1]
+        )
+
+    def tiles(self):
+        """Return the tiles on the display and their display positions.
+
+        A tile is the (column, row) of the tile in the plane.
+        """
+        first = (
+            self.offset[0]//TILE_SIZE,
+            self.offset[1]//TILE_SIZE
+        )
+        last = (
+            (self.offset[0] + self.size[0] - 1)//TILE_SIZE,
+            (self.offset[1] + self.size[1] - 1)//TILE_SIZE
+        )
+
+        return [
+            (
+                (i, j),
+                (i*TILE_SIZE - self.offset[0], j*TILE_SIZE - self.offset[1])
+            )
+            for j in range(first[1], last[1] + 1)
+            for i in range(first[0], last[0] + 1)
+        ]
+
+    def tile_area(self, tile):
+        """Return the view and size (in pixels) of a tile."""
+        corner = (tile[0]*TILE_SIZE, tile[1]*TILE_SIZE)
+        return self.tile_view(corner), (TILE_SIZE, TILE_SIZE)
+
+def render_tile(f, view, size):
+    """Return the flat indices of the pixels that f covers in a view.
+
+    The indices are of a pixel array of the size (as from
+    pygame.surfarray), so a tile is stored in far less memory
+    than its pixels.
+    """
+    covered = np.zeros(size, dtype=bool)
+    xs, ys = sample(f, view, size)
+    rasterize(covered, *to_pixels(xs, ys, view, size), True)
+
+    return np.flatnonzero(covered).astype(np.int32)
+
+# The expressions of a TileRenderer's worker process.
+worker_expressions = []
+
+def start_worker(texts):
+    """Compile the expressions of a worker process (once)."""
+    worker_expressions[:] = [Expression(text) for text in texts]
+
+def render_tiles(job):
+    """Draw a tile of some functions in a worker process.
+
+    The job is the tile's key, view and size and the indices of
+    the functions. The pixel indices of all of the functions are
+    put into a new block of shared memory, and the key, function
+    indices, number of pixel indices of each function and the name
+    of the block are returned.
+    """
+    key, view, size, indices = job
+    covered = [render_tile(worker_expressions[i], view, size) for i in indices]
+    data = np.concatenate(covered)
+
+    # The block is left for the main process to read and free.
+    memory = shared_memory.SharedMemory(create=True, size=max(data.nbytes, 1))
+    np.ndarray(data.shape, data.dtype, memory.buf)[:] = data
+    memory.close()
+
+    return key, indices, [len(c) for c in covered], memory.name
+
+class TileRenderer:
+    """Class for a pool of processes that draw tiles in the background.
+
+    The functions are given as the text of their expressions (so
+    each process compiles them once), and are referred to by their
+    index. Tiles are asked for with request(), which returns at
+    once, and the tiles that have been drawn since are returned
+    by collect().
+
+    Requests wait in the renderer until the pool has room for
+    them, so a request that is no longer wanted can be dropped
+    before it is drawn.
+    """
+
+    def __init__(self, texts, processes=PROCESSES):
+        """Create the renderer and start its processes."""
+        processes = processes or multiprocessing.cpu_count()
+
+        # The processes share this process's resource tracker, so the
+        # shared memory that they make outlives them.
+        resource_tracker.ensure_running()
+        self.pool = multiprocessing.Pool(processes, start_worker, (texts,))
+        self.limit = JOBS*processes
+        self.jobs = 0
+        self.frame = 0
+
+        # The functions of each tile that are waiting or being drawn,
+        # the ones whose jobs failed (which aren't drawn again), and the
+        # requests that are waiting (in the order they were last asked
+        # for).
+        self.pending = set()
+        self.failed = set()
+        self.waiting = OrderedDict()
+
+        # The pool's results arrive on another thread.
+        self.finished = queue.SimpleQueue()
+
+    def request(self, key, view, size, indices):
+        """Ask for a tile of the functions with the indices.
+
+        The tile is known by its key, and functions whose tile is
+        already waiting or being drawn (or failed to be drawn) are
+        skipped. Requests that are asked for again move to the front
+        of the queue, so the most recently asked for tiles are drawn
+        first, and requests that aren't asked for again before the
+        next collect() are dropped (as their tiles have gone out of
+        view). Only JOBS jobs for each process are given to the pool
+        at once, and those are always drawn.
+        """
+        new = [
+            i for i in indices
+            if (key, i) not in self.pending and (key, i) not in self.failed
+        ]
+        self.pending.update((key, i) for i in new)
+
+        if key in self.waiting:
+            self.waiting[key][3].extend(new)
+        elif new:
+            self.waiting[key] = [self.frame, view, size, new]
+        else:
+            return
+
+        self.waiting[key][0] = self.frame
+        self.waiting.move_to_end(key)
+        self.start_jobs()
+
+    def start_jobs(self):
+        """Give the most recent requests to the pool while it has room."""
+        while self.waiting and self.jobs < self.limit:
+            key, (frame, view, size, indices) = self.waiting.popitem()
+            batch = indices[:TILE_BATCH]
+
+            if indices[TILE_BATCH:]:
+                self.waiting[key] = [frame, view, size, indices[TILE_BATCH:]]
+
+            self.jobs += 1
+            self.pool.apply_async(
+                render_tiles, ((key, view, size, batch),),
+                callback=self.finished.put,
+                error_callback=partial(self.job_failed, key, batch)
+            )
+
+    def job_failed(self, key, indices, error):
+        """Queue a failed job's error with its tile's key and functions."""
+        self.finished.put((key, indices, error))
+
+    def collect(self):
+        """Return the tiles drawn since the last collect.
+
+        Each is the tile's key, the function's index and the flat
+        indices of the pixels that it covers (as from render_tile()).
+        Waiting requests that haven't been asked for since the last
+        collect are dropped. If a job failed, its error is reported
+        and its functions are skipped on that tile from then on, so
+        the other tiles are still drawn.
+        """
+        for key, (frame, view, size, indices) in list(self.waiting.items()):
+            if frame != self.frame:
+                del self.waiting[key]
+                self.pending.difference_update((key, i) for i in indices)
+
+        self.frame += 1
+        drawn = []
+
+        while True:
+            try:
+                result = self.finished.get_nowait()
+            except queue.Empty:
+                break
+
+            self.jobs -= 1
+
+            if isinstance(result[-1], BaseException):
+                key, indices, error = result
+                failed = [(key, i) for i in indices]
+                self.pending.difference_update(failed)
+                self.failed.update(failed)
+                print("Tile could not be drawn:", repr(error))
+                continue
+
+            key, indices, lengths, name = result
+            memory = shared_memory.SharedMemory(name)
+            data = np.ndarray(sum(lengths), np.int32, memory.buf).copy()
+            memory.close()
+            memory.unlink()
+
+            for i, covered in zip(indices, np.split(data, np.cumsum(lengths)[:-1])):
+                self.pending.discard((key, i))
+                drawn.append((key, i, covered))
+
+        self.start_jobs()
+        return drawn
+
+    def close(self):
+        """Stop the processes (after their jobs) and free the results."""
+        self.waiting.clear()
+        self.pool.close()
+        self.pool.join()
+        self.collect()
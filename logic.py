@@ -0,0 +1,406 @@
+""" A gate-level logic simulator built on nand.nand.
+
+Circuits are built in a Netlist by calling nand.nand() (or any of nand.py's
+functions) on its wires, so adders, multiplexers and registers are all made of
+NAND gates. Unlike a nand.Circuit, a netlist's gates may feed back into each other,
+so latches and registers can be built from them.
+
+A Simulator keeps the value of every wire. It is event-driven: when a wire changes,
+only the gates that it feeds are evaluated again, and only the gates fed by those
+that change after them, until the netlist settles. Naive full re-evaluation (every
+gate evaluated over and over until nothing changes) is also available to compare it
+with (see benchmark()).
+
+Buses are lists of wires, least significant bit first.
+"""
+
+import time
+import random
+from collections import deque
+
+from nand import nand, Wire
+
+WIDTH = 32 # The number of bits of the benchmark's adder and the counter.
+STEPS = 20000 # The number of additions in the benchmark.
+CYCLES = 20000 # The number of clock cycles that the counter is run for.
+SEED = 0 # The seed of the benchmark's additions.
+SETTLE_LIMIT = 100 # The most evaluations of each gate (on average) before a netlist is taken to be oscillating.
+
+class OscillationError(Exception):
+    """Raised when a netlist doesn't settle."""
+
+class Netlist:
+    """A netlist of NAND gates whose gates may form loops.
+    
+    Every wire is an input or the output of a gate. sources[wire] is the pair of wires
+    that the wire's gate NANDs (or None for inputs) and fanout[wire] is the gates
+    that the wire feeds.
+    """
+    
+    def __init__(self):
+        """Creates a netlist with no wires."""
+        
+        self.sources = []
+        self.fanout = []
+        self.inputs = []
+        self.shared = {}
+    
+    def wire(self, source):
+        """Adds a wire with the source and returns it."""
+        
+        self.sources.append(source)
+        self.fanout.append([])
+        
+        return Wire(self, len(self.sources) - 1)
+    
+    def input(self):
+        """Adds an input and returns its wire."""
+        
+        wire = self.wire(None)
+        self.inputs.append(wire.index)
+        
+        return wire
+    
+    def bus(self, width):
+        """Adds a bus of inputs and returns its wires."""
+        
+        return [self.input() for i in range(width)]
+    
+    def gate(self, x, y):
+        """Adds a gate that NANDs two wires and returns its output wire.
+        
+        Gates with the same inputs are shared (as in a nand.Circuit), so this is
+        what nand.nand() calls on the netlist's wires.
+        """
+        
+        key = (min(x.index, y.index), max(x.index, y.index))
+        
+        if key not in self.shared:
+            self.shared[key] = self.placeholder().index
+            self.connect(Wire(self, self.shared[key]), x, y)
+        
+        return Wire(self, self.shared[key])
+    
+    def placeholder(self):
+        """Adds a gate whose inputs are connected later (to build loops) and returns its wire."""
+        
+        return self.wire((None, None))
+    
+    def connect(self, wire, x, y):
+        """Connects the inputs of a placeholder gate to two wires."""
+        
+        self.sources[wire.index] = (x.index, y.index)
+        self.fanout[x.index].append(wire.index)
+        
+        if y.index != x.index:
+            self.fanout[y.index].append(wire.index)
+
+def negate(x):
+    """Returns the negation of a wire."""
+    
+    return nand(x, x)
+
+def half_adder(a, b):
+    """Returns the sum and carry of two bits (5 gates)."""
+    
+    t = nand(a, b)
+    
+    return nand(nand(a, t), nand(b, t)), negate(t)
+
+def full_adder(a, b, carry):
+    """Returns the sum and carry of two bits and a carry (9 gates)."""
+    
+    t = nand(a, b)
+    half = nand(nand(a, t), nand(b, t))
+    u = nand(half, carry)
+    
+    return nand(nand(half, u), nand(carry, u)), nand(t, u)
+
+def ripple_adder(a, b, carry):
+    """Returns the sum bus and the carry out of two buses and a carry in."""
+    
+    sums = []
+    
+    for x, y in zip(a, b):
+        total, carry = full_adder(x, y, carry)
+        sums.append(total)
+    
+    return sums, carry
+
+def incrementer(a, carry):
+    """Returns the sum bus and the carry out of a bus and a carry in."""
+    
+    sums = []
+    
+    for x in a:
+        total, carry = half_adder(x, carry)
+        sums.append(total)
+    
+    return sums, carry
+
+def multiplexer(select, a, b):
+    """Returns the bus a if select is True and the bus b if it's False."""
+    
+    other = negate(select)
+    
+    return [nand(nand(select, x), nand(other, y)) for x, y in zip(a, b)]
+
+def latch(enable, data):
+    """Returns the output of a gated D latch (transparent while enable is True).
+    
+    The latch's two output gates feed each other, so it keeps its value while
+    enable is False.
+    """
+    
+    netlist = data.circuit
+    s = nand(data, enable)
+    r = nand(s, enable)
+    q = netlist.placeholder()
+    netlist.connect(q, s, nand(r, q))
+    
+    return q
+
+def register(clock, data):
+    """Returns the output bus of a register that stores the data bus on the rising edge of the clock.
+    
+    Each bit is a master latch (open while the clock is low) followed by a slave
+    latch (open while the clock is high).
+    """
+    
+    low = negate(clock)
+    
+    return [latch(clock, latch(low, bit)) for bit in data]
+
+class Simulator:
+    """The values of a netlist's wires, which are settled after inputs change.
+    
+    If event_driven is False, every settle evaluates all of the gates in order until
+    none of them change.
+    """
+    
+    def __init__(self, netlist, event_driven = True):
+        """Creates the simulator with every input False and settles the netlist."""
+        
+        self.netlist = netlist
+        self.event_driven = event_driven
+        self.values = [False] * len(netlist.sources)
+        self.evaluations = 0
+        
+        # Every gate is evaluated at the start.
+        self.gates = [w for w, source in enumerate(netlist.sources) if source is not None]
+        self.queue = deque(self.gates)
+        self.queued = [source is not None for source in netlist.sources]
+        
+        self.settle()
+    
+    def set(self, wire, value):
+        """Sets the value of an input (the netlist is settled by settle())."""
+        
+        value = bool(value)
+        
+        if self.values[wire.index] != value:
+            self.values[wire.index] = value
+            
+            if self.event_driven:
+                for gate in self.netlist.fanout[wire.index]:
+                    if not self.queued[gate]:
+                        self.queued[gate] = True
+                        self.queue.append(gate)
+    
+    def get(self, wire):
+        """Returns the value of a wire."""
+        
+        return self.values[wire.index]
+    
+    def set_bus(self, bus, value):
+        """Sets the inputs of a bus to the bits of an int."""
+        
+        for i, wire in enumerate(bus):
+            self.set(wire, value >> i & 1)
+    
+    def get_bus(self, bus):
+        """Returns the value of a bus as an int."""
+        
+        return sum(self.values[wire.index] << i for i, wire in enumerate(bus))
+    
+    def settle(self):
+        """Evaluates gates until the netlist settles and returns the number of evaluations."""
+        
+        if self.event_driven:
+            evaluations = self.propagate()
+        else:
+            evaluations = self.sweep()
+        
+        self.evaluations += evaluations
+        
+        return evaluations
+    
+    def propagate(self):
+        """Evaluates the queued gates, queueing the gates fed by any that change."""
+        
+        values = self.values
+        sources = self.netlist.sources
+        fanout = self.netlist.fanout
+        queue = self.queue
+        queued = self.queued
+        limit = SETTLE_LIMIT * len(self.gates)
+        evaluations = 0
+        
+        while queue:
+            wire = queue.popleft()
+            queued[wire] = False
+            x, y = sources[wire]
+            
+            # nand.nand() inlined, as this is the simulator's inner loop.
+            value = not (values[x] and values[y])
+            evaluations += 1
+            
+            if value != values[wire]:
+                values[wire] = value
+                
+                for gate in fanout[wire]:
+                    if not queued[gate]:
+                        queued[gate] = True
+                        queue.append(gate)
+                
+                if evaluations > limit:
+                    raise OscillationError("The netlist didn't settle.")
+        
+        return evaluations
+    
+    def sweep(self):
+        """Evaluates every gate in order until none of them change."""
+        
+        values = self.values
+        sources = self.netlist.sources
+        evaluations = 0
+        changed = True
+        
+        # The queue is only used by the start of an event-driven simulator.
+        self.queue.clear()
+        
+        while changed:
+            changed = False
+            
+            for wire in self.gates:
+                x, y = sources[wire]
+                value = not (values[x] and values[y])
+                
+                if value != values[wire]:
+                    values[wire] = value
+                    changed = True
+            
+            evaluations += len(self.gates)
+            
+            if evaluations > SETTLE_LIMIT * len(self.gates):
+                raise OscillationError("The netlist didn't settle.")
+        
+        return evaluations
+    
+    def tick(self, clock):
+        """Runs a clock cycle: raises the clock, settles, lowers it and settles."""
+        
+        self.set(clock, True)
+        self.settle()
+        self.set(clock, False)
+        self.settle()
+
+def benchmark(event_driven, counting, width = WIDTH, steps = STEPS, seed = SEED):
+    """Adds numbers with a ripple-carry adder and returns the time and gate evaluations.
+    
+    If counting is True, one addend counts up by one each step (as in a program
+    counter), so few of its bits change. Otherwise the addends take turns to change
+    to random numbers. Either way, only the gates that depend on the changed bits
+    need to be evaluated again.
+    """
+    
+    netlist = Netlist()
+    a = netlist.bus(width)
+    b = netlist.bus(width)
+    carry = netlist.input()
+    sums, out = ripple_adder(a, b, carry)
+    
+    simulator = Simulator(netlist, event_driven)
+    simulator.evaluations = 0
+    rng = random.Random(seed)
+    x = 0
+    y = rng.getrandbits(width)
+    simulator.set_bus(b, y)
+    start = time.perf_counter()
+    
+    for step in range(steps):
+        if counting:
+            x = (x + 1) % (1 << width)
+            simulator.set_bus(a, x)
+        
+        elif step % 2:
+            x = rng.getrandbits(width)
+            simulator.set_bus(a, x)
+        
+        else:
+            y = rng.getrandbits(width)
+            simulator.set_bus(b, y)
+        
+        simulator.settle()
+        
+        if simulator.get_bus(sums) | simulator.get(out) << width != x + y:
+            raise ArithmeticError("The adder's sum is wrong.")
+    
+    return time.perf_counter() - start, simulator.evaluations
+
+def counter(width = WIDTH, cycles = CYCLES):
+    """Runs a counter (a register and an incrementer) for clock cycles and returns its value and time.
+    
+    A register's latches start in an arbitrary state, so the counter is cleared
+    (its data is forced to 0 for a cycle) before it counts.
+    """
+    
+    netlist = Netlist()
+    clock = netlist.input()
+    one = netlist.input()
+    clear = netlist.input()
+    keep = negate(clear)
+    
+    # The register's data is its own output plus one (unless it's cleared), which is
+    # only known after the register is built, so each data bit is a placeholder gate.
+    data = [netlist.placeholder() for i in range(width)]
+    count = register(clock, data)
+    sums, carry = incrementer(count, one)
+    
+    for wire, total in zip(data, sums):
+        # total and keep
+        kept = nand(total, keep)
+        netlist.connect(wire, kept, kept)
+    
+    simulator = Simulator(netlist)
+    simulator.set(one, True)
+    simulator.set(clear, True)
+    simulator.settle()
+    simulator.tick(clock)
+    simulator.set(clear, False)
+    simulator.settle()
+    start = time.perf_counter()
+    
+    for cycle in range(cycles):
+        simulator.tick(clock)
+    
+    return simulator.get_bus(count), time.perf_counter() - start
+
+def main():
+    """Benchmarks the simulator against full re-evaluation and runs a counter."""
+    
+    for counting, inputs in ((False, "random"), (True, "counting")):
+        for event_driven, name in ((False, "Full re-evaluation"), (True, "Event-driven")):
+            seconds, evaluations = benchmark(event_driven, counting)
+            
+            print(name, "{}-bit adder ({} inputs):".format(WIDTH, inputs),
+                  "{:.0f} additions per second,".format(STEPS / seconds),
+                  "{:.1f} gate evaluations per addition".format(evaluations / STEPS))
+    
+    value, seconds = counter()
+    
+    print("Counter:", value, "after", CYCLES, "cycles,",
+          "{:.0f} cycles per second".format(CYCLES / seconds))
+
+if __name__ == "__main__":
+    main()
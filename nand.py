@@ -1,7 +1,37 @@
-""" All binary bit functions expressed in terms of NAND."""
+""" All binary bit functions expressed in terms of NAND.
+
+The functions can also be compiled into Circuits: flat lists of NAND gates that
+are evaluated bit-parallel, so one evaluation computes a function over every bit
+of Python ints or NumPy uint64 arrays at once. Compiled circuits share every
+repeated subterm, and minimal_circuits() finds the smallest possible circuit of
+each function.
+
+Functions of any number of inputs are given as truth tables (ints with one bit
+for each valuation), and synthesize() builds their NAND circuits.
+"""
+
+import multiprocessing
+from collections import deque
+
+PROCESSES = None # The number of processes used by synthesize_all() (None for all cores).
+TRUTH_CHUNK = 16 # The number of inputs whose valuations truth_table() evaluates at once.
 
 # Negated Conjunction
-nand = lambda x, y: not (x and y)
+def nand(x, y):
+    """Returns the NAND of two bits, or the wire of a new gate if either is a Wire."""
+    
+    if isinstance(y, Wire) and not isinstance(x, Wire):
+        x, y = y, x
+    
+    # Wires of a circuit being traced are joined by a new gate, and constants are
+    # folded (NAND with True negates the wire and NAND with False is True).
+    if isinstance(x, Wire):
+        if not isinstance(y, Wire):
+            return x.circuit.gate(x, x) if y else True
+        
+        return x.circuit.gate(x, y)
+    
+    return not (x and y)
 
 # 1st Identity
 id1 = lambda x, y: x
@@ -71,8 +101,357 @@ FUNCTIONS = [
     neg1, imp, nand, top
 ]
 
+# The names of the functions (in the order of FUNCTIONS).
+NAMES = [
+    "bottom", "con", "nimp", "id1",
+    "nrmp", "id2", "xor", "dis",
+    "nor", "xnor", "neg2", "rmp",
+    "neg1", "imp", "nand", "top"
+]
+
+# The truth tables of x and y: bit i is the value of valuation i, and FUNCTIONS[i]
+# has the truth table i.
+X_TABLE = 0b0011
+Y_TABLE = 0b0101
+
+class Wire:
+    """A wire of a circuit being traced (an input or the output of a gate)."""
+    
+    def __init__(self, circuit, index):
+        """Creates the circuit's wire with the index."""
+        
+        self.circuit = circuit
+        self.index = index
+
+class Circuit:
+    """A circuit of NAND gates as a flat list.
+    
+    Wires 0 to inputs - 1 are the inputs and gate i drives wire inputs + i. Each gate
+    is the pair of wires that it NANDs, which always come before it, so the gates
+    can be evaluated in order.
+    """
+    
+    def __init__(self, inputs, share = True):
+        """Creates a circuit with no gates.
+        
+        If share is True, the gates are hash-consed: a gate with the same inputs as
+        an existing gate (in either order) is never added again, so the circuit is a
+        DAG with no repeated subterms.
+        """
+        
+        self.inputs = inputs
+        self.share = share
+        self.gates = []
+        self.outputs = []
+        self.shared = {}
+        self.plan = None
+    
+    def gate(self, x, y):
+        """Adds a gate that NANDs two wires and returns its output wire."""
+        
+        # NAND is commutative, so the inputs are ordered before they're looked up.
+        key = (min(x.index, y.index), max(x.index, y.index))
+        
+        if self.share and key in self.shared:
+            return Wire(self, self.shared[key])
+        
+        self.gates.append(key)
+        self.shared[key] = self.inputs + len(self.gates) - 1
+        
+        return Wire(self, self.shared[key])
+    
+    def depth(self):
+        """Returns the number of gates on the longest path from an input to an output."""
+        
+        depths = [0] * self.inputs
+        
+        for x, y in self.gates:
+            depths.append(max(depths[x], depths[y]) + 1)
+        
+        return max(depths[output] for output in self.outputs)
+    
+    def evaluate(self, *values, width = None):
+        """Returns the values of the outputs for the values of the inputs.
+        
+        Each value is evaluated bit-parallel: bit i of every input is one valuation
+        and bit i of every output is its result. The values are NumPy unsigned (or
+        bool) arrays, or Python ints with the width in bits.
+        """
+        
+        wires = list(values)
+        releases = self.releases()
+        
+        # Wires are freed after their last use, so large circuits fit in memory.
+        if width is None:
+            for (x, y), release in zip(self.gates, releases):
+                wires.append(~(wires[x] & wires[y]))
+                
+                for wire in release:
+                    wires[wire] = None
+        
+        # Python ints are negative when inverted, so only the width is inverted.
+        else:
+            mask = (1 << width) - 1
+            
+            for (x, y), release in zip(self.gates, releases):
+                wires.append(mask ^ (wires[x] & wires[y]))
+                
+                for wire in release:
+                    wires[wire] = None
+        
+        return [wires[output] for output in self.outputs]
+    
+    def releases(self):
+        """Returns the wires that each gate is the last user of (outputs are never released)."""
+        
+        # The plan is only made again if gates or outputs have been added.
+        size = (len(self.gates), len(self.outputs))
+        
+        if self.plan is None or self.plan[0] != size:
+            last = {}
+            
+            for gate, (x, y) in enumerate(self.gates):
+                last[x] = gate
+                last[y] = gate
+            
+            for output in self.outputs:
+                last.pop(output, None)
+            
+            releases = [[] for gate in self.gates]
+            
+            for wire, gate in last.items():
+                releases[gate].append(wire)
+            
+            self.plan = (size, releases)
+        
+        return self.plan[1]
+
+def circuit(function, inputs = 2, share = True):
+    """Compiles a function of nand() into a Circuit by tracing it with wires.
+    
+    Unless share is False, repeated subterms become a single gate.
+    """
+    
+    compiled = Circuit(inputs, share)
+    output = function(*(Wire(compiled, i) for i in range(inputs)))
+    compiled.outputs.append(output.index)
+    
+    return compiled
+
+# All functions compiled into circuits (in the order of FUNCTIONS).
+CIRCUITS = [circuit(f) for f in FUNCTIONS]
+
+def minimal_circuits():
+    """Returns the smallest NAND circuit of every function (in the order of FUNCTIONS).
+    
+    The search is breadth-first over the sets of truth tables that a circuit has
+    computed, with each set stored as a 16-bit mask (bit t is set if table t has been
+    computed). Each step adds a gate that NANDs two computed tables, and every set
+    is only searched once, so the search is exhaustive but visits at most 2 ** 16
+    sets. A function's circuit is the first one that computes its table.
+    """
+    
+    start = (1 << X_TABLE) | (1 << Y_TABLE)
+    
+    # The set that each set was found from, and the gate (as tables) that was added.
+    found = {start: None}
+    queue = deque([start])
+    solutions = {}
+    
+    while queue and len(solutions) < 16:
+        tables = queue.popleft()
+        
+        for table in range(16):
+            if tables >> table & 1 and table not in solutions:
+                solutions[table] = tables
+        
+        computed = [t for t in range(16) if tables >> t & 1]
+        
+        for i, a in enumerate(computed):
+            for b in computed[i:]:
+                new = tables | (1 << (15 ^ (a & b)))
+                
+                if new not in found:
+                    found[new] = (tables, a, b)
+                    queue.append(new)
+    
+    circuits = []
+    
+    for table in range(16):
+        # The gates are found by following the sets back to the start.
+        gates = []
+        tables = solutions[table]
+        
+        while found[tables]:
+            tables, a, b = found[tables]
+            gates.append((a, b))
+        
+        minimal = Circuit(2)
+        wires = {X_TABLE: Wire(minimal, 0), Y_TABLE: Wire(minimal, 1)}
+        
+        for a, b in reversed(gates):
+            wires[15 ^ (a & b)] = minimal.gate(wires[a], wires[b])
+        
+        minimal.outputs.append(wires[table].index)
+        circuits.append(minimal)
+    
+    return circuits
+
+def input_table(index, inputs):
+    """Returns the truth table of an input of a function of inputs inputs.
+    
+    Bit i of a truth table is the value of valuation i, and input k is True in
+    valuation i if bit inputs - 1 - k of i is 0 (so the tables of 2 inputs are
+    X_TABLE and Y_TABLE, and truth table t of 2 inputs is FUNCTIONS[t]).
+    """
+    
+    # The input is True for the first half of each period of its table.
+    half = 1 << (inputs - 1 - index)
+    table = (1 << half) - 1
+    width = 2 * half
+    
+    while width < 1 << inputs:
+        table |= table << width
+        width *= 2
+    
+    return table
+
+def truth_table(compiled):
+    """Returns the truth table of a circuit's first output (over every valuation).
+    
+    The valuations are evaluated in chunks of the valuations of the last TRUTH_CHUNK
+    inputs, so the wires of large circuits stay small.
+    """
+    
+    inputs = compiled.inputs
+    chunked = min(inputs, TRUTH_CHUNK)
+    width = 1 << chunked
+    ones = (1 << width) - 1
+    fixed = inputs - chunked
+    table = 0
+    
+    # The inputs that vary within a chunk have the same tables in every chunk.
+    varying = [input_table(k, chunked) for k in range(chunked)]
+    
+    for chunk in range(1 << fixed):
+        # The first inputs are constant in a chunk (bit fixed - 1 - k of its index).
+        constant = [0 if chunk >> (fixed - 1 - k) & 1 else ones for k in range(fixed)]
+        output = compiled.evaluate(*constant, *varying, width = width)[0]
+        table |= output << (chunk * width)
+    
+    return table
+
+def synthesize(table, inputs):
+    """Returns a NAND circuit with the truth table for a function of inputs inputs.
+    
+    The table is split on each input in turn into the tables for the input being
+    True and False (a Shannon decomposition), and the halves are joined by a
+    multiplexer of NAND gates. Halves that have already been built are reused (the
+    circuit is shared like a binary decision diagram) and constant or equal halves
+    need fewer gates.
+    """
+    
+    if inputs < 1:
+        raise ValueError("A circuit needs at least one input.")
+    
+    synthesized = Circuit(inputs)
+    wires = [Wire(synthesized, k) for k in range(inputs)]
+    built = {}
+    
+    def build(table, level):
+        """Returns the wire (or the constant True or False) of a table from the level's input onwards."""
+        
+        width = 1 << (inputs - level)
+        
+        if table == 0:
+            return False
+        
+        if table == (1 << width) - 1:
+            return True
+        
+        key = (level, table)
+        
+        if key not in built:
+            half = width >> 1
+            high = build(table & ((1 << half) - 1), level + 1)
+            low = build(table >> half, level + 1)
+            x = wires[level]
+            
+            if high is low:
+                built[key] = high
+            
+            elif high is True and low is False:
+                built[key] = x
+            
+            elif high is False and low is True:
+                built[key] = negate(x)
+            
+            # x and high
+            elif low is False:
+                built[key] = negate(nand(x, high))
+            
+            # not x and low
+            elif high is False:
+                built[key] = negate(nand(negate(x), low))
+            
+            # x or low
+            elif high is True:
+                built[key] = nand(negate(x), negate(low))
+            
+            # not x or high
+            elif low is True:
+                built[key] = nand(x, negate(high))
+            
+            else:
+                built[key] = nand(nand(x, high), nand(negate(x), low))
+        
+        return built[key]
+    
+    def negate(wire):
+        """Returns the negation of a wire."""
+        
+        return nand(wire, wire)
+    
+    output = build(table, 0)
+    
+    # Constant functions are built from the first input.
+    if output is True or output is False:
+        one = nand(wires[0], negate(wires[0]))
+        output = one if output else negate(one)
+    
+    synthesized.outputs.append(output.index)
+    
+    return synthesized
+
+def synthesize_job(job):
+    """Synthesizes a circuit in a worker process (the job is the table and inputs)."""
+    
+    return synthesize(*job)
+
+def synthesize_all(tables, inputs, processes = PROCESSES):
+    """Returns the circuits of truth tables of inputs inputs, synthesized in parallel."""
+    
+    with multiprocessing.Pool(processes) as pool:
+        return pool.map(synthesize_job, [(table, inputs) for table in tables])
+
+def report():
+    """Displays the gate count and depth of every function's circuits.
+    
+    The counts are for the function's expression as written (a tree with repeated
+    subterms), its compiled DAG and its minimal circuit.
+    """
+    
+    minimal = minimal_circuits()
+    
+    for name, function, compiled, smallest in zip(NAMES, FUNCTIONS, CIRCUITS, minimal):
+        tree = circuit(function, share = False)
+        
+        print(name, "tree:", len(tree.gates),
+              "DAG:", len(compiled.gates), "depth:", compiled.depth(),
+              "minimal:", len(smallest.gates), "depth:", smallest.depth())
+
 def main():
-    """Displays all of the functions' values of all valuations."""
+    """Displays all of the functions' values of all valuations and their circuits' sizes."""
     
     for x in (False, True):
         for y in (False, True):
@@ -80,6 +459,9 @@ def main():
                 print(i, end = ' ')
             
             print()
+    
+    print()
+    report()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file